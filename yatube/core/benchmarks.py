@@ -0,0 +1,38 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def scratch_database():
+    """Временная база для замеров: рабочие данные не трогаются."""
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(func, repeat=5):
+    """Медиана времени выполнения func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def print_table(stdout, title, header, rows):
+    stdout.write(title)
+    stdout.write(''.join(f'{column:>12}' for column in header))
+    for row in rows:
+        stdout.write(''.join(
+            f'{value:>12.2f}' if isinstance(value, float) else f'{value:>12}'
+            for value in row
+        ))
+    stdout.write('')
@@ -0,0 +1,390 @@
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Время последнего чтения обновляется не чаще раза в столько секунд:
+# иначе каждое чтение было бы записью в базу.
+ACCESS_RESOLUTION = 1
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL, общий для всех процессов хоста.
+
+    LOCATION - путь к файлу базы. OPTIONS:
+        TABLE        - таблица, по одной на алиас в одном файле;
+        MAX_ENTRIES  - сколько ключей хранить, дальше вытеснение давно
+                       не читавшихся (LRU);
+        CULL_FREQUENCY - при переполнении удаляется 1/CULL_FREQUENCY ключей;
+        CULL_EVERY   - истекшие и лишние ключи удаляются раз в столько
+                       записей потока: MAX_ENTRIES соблюдается
+                       приблизительно, зато запись не считает строки;
+        BUSY_TIMEOUT - сколько секунд ждать блокировку записи.
+
+    Целые числа хранятся как INTEGER, поэтому incr - один атомарный
+    UPDATE, а не чтение и запись из Python.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.table = options.get('TABLE', 'cache')
+        self.busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self.cull_every = max(1, int(options.get('CULL_EVERY', 100)))
+        self.local = threading.local()
+
+    def _connection(self):
+        # Соединение нельзя унаследовать через fork: у каждого процесса
+        # и потока свое.
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None and self.local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self.location)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self.location, timeout=self.busy_timeout, isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(f'''
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires REAL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS {self.table}_accessed
+                ON {self.table} (accessed);
+        ''')
+        self.local.connection = connection
+        self.local.pid = os.getpid()
+        return connection
+
+    def _write(self, sql, params=()):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = connection.execute(sql, params)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return cursor.rowcount
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _cull_due(self):
+        writes = getattr(self.local, 'writes', 0) + 1
+        self.local.writes = writes % self.cull_every
+        return not self.local.writes
+
+    def _cull(self, connection, now):
+        connection.execute(
+            f'DELETE FROM {self.table} WHERE expires <= ?', (now,)
+        )
+        count = connection.execute(
+            f'SELECT COUNT(*) FROM {self.table}'
+        ).fetchone()[0]
+        if count <= self._max_entries:
+            return
+        excess = count - self._max_entries
+        if self._cull_frequency:
+            excess = max(excess, count // self._cull_frequency)
+        connection.execute(
+            f'DELETE FROM {self.table} WHERE key IN ('
+            f'SELECT key FROM {self.table} ORDER BY accessed LIMIT ?)',
+            (excess,)
+        )
+
+    def _store(self, items, timeout, mode):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        verb = 'INSERT OR REPLACE' if mode == 'set' else 'INSERT'
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            added = 0
+            for key, value in items:
+                if mode == 'add':
+                    connection.execute(
+                        f'DELETE FROM {self.table} '
+                        f'WHERE key = ? AND expires <= ?',
+                        (key, now)
+                    )
+                try:
+                    connection.execute(
+                        f'{verb} INTO {self.table} '
+                        f'(key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                        (key, self._encode(value), expires, now)
+                    )
+                    added += 1
+                except sqlite3.IntegrityError:
+                    pass
+            if self._cull_due():
+                self._cull(connection, now)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return added
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return bool(self._store([(key, value)], timeout, 'add'))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store([(self._key(key, version), value)], timeout, 'set')
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(
+            [(self._key(key, version), value) for key, value in data.items()],
+            timeout,
+            'set'
+        )
+        return []
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        names = {self._key(key, version): key for key in keys}
+        now = time.time()
+        rows = self._connection().execute(
+            f'SELECT key, value, accessed FROM {self.table} '
+            f'WHERE key IN ({", ".join("?" * len(names))}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            (*names, now)
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if accessed < now - ACCESS_RESOLUTION]
+        if stale:
+            # Порядок вытеснения не стоит ошибки чтения.
+            try:
+                self._write(
+                    f'UPDATE {self.table} SET accessed = ? '
+                    f'WHERE key IN ({", ".join("?" * len(stale))})',
+                    (now, *stale)
+                )
+            except sqlite3.OperationalError:
+                pass
+        return {names[key]: self._decode(value) for key, value, _ in rows}
+
+    def get(self, key, default=None, version=None):
+        values = self.get_many([key], version=version)
+        return values.get(key, default)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        return bool(self._write(
+            f'UPDATE {self.table} SET expires = ?, accessed = ? '
+            f'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now,
+             self._key(key, version), now)
+        ))
+
+    def delete(self, key, version=None):
+        self._write(
+            f'DELETE FROM {self.table} WHERE key = ?',
+            (self._key(key, version),)
+        )
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._write(
+                f'DELETE FROM {self.table} '
+                f'WHERE key IN ({", ".join("?" * len(keys))})',
+                keys
+            )
+
+    def has_key(self, key, version=None):
+        return self._connection().execute(
+            f'SELECT 1 FROM {self.table} '
+            f'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time())
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                f'UPDATE {self.table} SET value = value + ?, accessed = ? '
+                f'WHERE key = ? AND typeof(value) = \'integer\' '
+                f'AND (expires IS NULL OR expires > ?)',
+                (delta, now, key, now)
+            )
+            row = connection.execute(
+                f'SELECT value FROM {self.table} '
+                f'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, now)
+            ).fetchone()
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        value = self._decode(row[0])
+        if not isinstance(value, int):
+            raise TypeError(f"Key '{key}' is not an integer")
+        return value
+
+    def clear(self):
+        self._write(f'DELETE FROM {self.table}')
+
+    def close(self, **kwargs):
+        # Django закрывает кэши после каждого запроса, а соединение
+        # с файлом выгоднее держать открытым до конца процесса.
+        pass
+
+
+class StampedeCache(BaseCache):
+    """Обертка над другим кэшем, которая не дает пересчитывать одно
+    значение многим запросам сразу.
+
+    LOCATION - алиас кэша, где лежат значения. Вместе со значением
+    хранится срок свежести и время его последнего пересчета:
+    - промах get берет блокировку ключа; получивший ее пересчитывает
+      значение (get вернул default), остальные ждут его set;
+    - устаревшее значение еще STALE_TIMEOUT секунд отдается всем, кроме
+      одного запроса, который его пересчитывает;
+    - незадолго до срока get случайно считает значение устаревшим, тем
+      вероятнее, чем ближе срок и чем дольше пересчет (XFetch), и
+      пересчет обычно начинается раньше, чем значение устареет у всех.
+
+    OPTIONS:
+        STALE_TIMEOUT - сколько секунд отдавать устаревшее значение;
+        LOCK_TIMEOUT  - сколько секунд держится блокировка и ждут
+                        остальные, если пересчитывающий не вызвал set;
+        POLL_INTERVAL - как часто ожидающие проверяют значение;
+        BETA          - насколько рано начинать пересчет, 0 - не раньше
+                        срока.
+    Получивший default из get должен вызвать set или, если значение
+    не сохранится (ошибка, ответ не для кэша), release. Кто заведомо
+    не сохранит значение, читает через peek, не беря блокировку.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.alias = location
+        self.stale_timeout = options.get('STALE_TIMEOUT', 60)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        self.poll_interval = options.get('POLL_INTERVAL', 0.05)
+        self.beta = options.get('BETA', 1)
+        # Ключи, которые пересчитывает этот поток, и время начала.
+        self.local = threading.local()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _recomputing(self):
+        if not hasattr(self.local, 'started'):
+            self.local.started = {}
+        return self.local.started
+
+    def _lock(self, key, version):
+        if not self.cache.add(
+            f'{key}:lock', True, self.lock_timeout, version=version
+        ):
+            return False
+        self._recomputing()[(key, version)] = time.monotonic()
+        return True
+
+    def release(self, key, version=None):
+        """Снимает блокировку, если пересчитанное значение не будет
+        сохранено."""
+        if self._recomputing().pop((key, version), None) is not None:
+            self.cache.delete(f'{key}:lock', version=version)
+
+    def peek(self, key, default=None, version=None):
+        """Значение, даже устаревшее, без блокировки и ожидания."""
+        entry = self.cache.get(key, version=version)
+        return default if entry is None else entry[0]
+
+    def _fresh(self, expires, delta):
+        if expires is None:
+            return True
+        # -log(U) > 0: чем дольше пересчет, тем раньше срок для get.
+        early = -delta * self.beta * math.log(1 - random.random())
+        return time.time() + early < expires
+
+    def get(self, key, default=None, version=None):
+        if (key, version) in self._recomputing():
+            return default
+        entry = self.cache.get(key, version=version)
+        if entry is not None:
+            value, expires, delta = entry
+            if self._fresh(expires, delta) or not self._lock(key, version):
+                return value
+            return default
+        deadline = time.monotonic() + self.lock_timeout
+        # Блокировка снята без set - пересчитывать будет следующий.
+        while not self._lock(key, version):
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+            entry = self.cache.get(key, version=version)
+            if entry is not None:
+                return entry[0]
+        return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        started = self._recomputing().pop((key, version), None)
+        delta = time.monotonic() - started if started is not None else 0
+        if timeout is None:
+            self.cache.set(key, (value, None, delta), None, version=version)
+        elif timeout > 0:
+            self.cache.set(
+                key,
+                (value, time.time() + timeout, delta),
+                timeout + self.stale_timeout,
+                version=version
+            )
+        else:
+            self.cache.delete(key, version=version)
+        if started is not None:
+            self.cache.delete(f'{key}:lock', version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.cache.get(key, version=version) is not None:
+            return False
+        self.set(key, value, timeout, version)
+        return True
+
+    def delete(self, key, version=None):
+        self.cache.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.cache.has_key(key, version=version)
+
+    def clear(self):
+        self.cache.clear()
@@ -0,0 +1,7 @@
+from yatube.settings import POST_ROW_CACHE_TIMEOUT
+
+
+def cache_timeouts(request):
+    return {
+        'post_row_cache_timeout': POST_ROW_CACHE_TIMEOUT
+    }
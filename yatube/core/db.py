@@ -0,0 +1,13 @@
+from django.conf import settings
+
+
+def tune_sqlite(sender, connection, **kwargs):
+    """Выставляет SQLITE_PRAGMAS новому соединению с SQLite.
+
+    Настройки читаются через django.conf: в боевом профиле они свои.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
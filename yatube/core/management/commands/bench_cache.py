@@ -0,0 +1,97 @@
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from core.benchmarks import print_table
+
+BACKENDS = (
+    ('locmem', 'django.core.cache.backends.locmem.LocMemCache', 'bench'),
+    ('file', 'django.core.cache.backends.filebased.FileBasedCache', 'files'),
+    ('sqlite', 'core.cache.SQLiteCache', 'cache.sqlite3'),
+)
+COUNTER = 'bench:counter'
+# Примерно столько весит закэшированный фрагмент ленты.
+FRAGMENT = 'x' * 2048
+
+
+def open_cache(backend, location, keys):
+    return import_string(backend)(location, {'OPTIONS': {
+        'MAX_ENTRIES': keys * 2
+    }})
+
+
+def work(backend, location, keys, ops, incr_every, seed):
+    """Поток запросов одного воркера: чтение фрагмента, при промахе -
+    запись, и время от времени сброс версии через incr."""
+    cache = open_cache(backend, location, keys)
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(keys)]
+    names = [f'bench:{i}' for i in range(keys)]
+    hits = incrs = 0
+    started = time.perf_counter()
+    for step, name in enumerate(rng.choices(names, weights, k=ops), 1):
+        if cache.get(name) is None:
+            cache.set(name, FRAGMENT)
+        else:
+            hits += 1
+        if step % incr_every == 0:
+            cache.incr(COUNTER)
+            incrs += 1
+    return hits, incrs, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает LocMemCache, файловый кэш и общий SQLiteCache '
+        'под нагрузкой из нескольких процессов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--ops', type=int, default=20_000)
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--incr-every', type=int, default=50)
+
+    def run(self, backend, location, options):
+        cache = open_cache(backend, location, options['keys'])
+        cache.clear()
+        cache.set(COUNTER, 0, None)
+        workers = options['workers']
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(
+                work,
+                *zip(*(
+                    (backend, location, options['keys'], options['ops'],
+                     options['incr_every'], seed)
+                    for seed in range(workers)
+                ))
+            ))
+        hits = sum(result[0] for result in results)
+        incrs = sum(result[1] for result in results)
+        elapsed = max(result[2] for result in results)
+        # Счетчик читается в родительском процессе: у LocMemCache
+        # он не увидит ни одного incr воркеров.
+        lost = incrs - (cache.get(COUNTER) or 0)
+        total = workers * options['ops']
+        return total / elapsed, 100 * hits / total, lost
+
+    def handle(self, *args, **options):
+        rows = []
+        with tempfile.TemporaryDirectory() as directory:
+            # Для LocMemCache путь - просто имя области памяти.
+            for name, backend, location in BACKENDS:
+                location = os.path.join(directory, location)
+                rows.append((name, *self.run(backend, location, options)))
+                self.stdout.write(f'Готово: {name}')
+        print_table(
+            self.stdout,
+            f'{options["workers"]} процессов по {options["ops"]} '
+            'операций',
+            ('кэш', 'оп/с', 'попаданий %', 'потерь incr'),
+            rows
+        )
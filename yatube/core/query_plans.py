@@ -0,0 +1,48 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Полный проход таблицы без индекса и сортировка во временном дереве.
+# Проход по результату подзапроса таблицей не считается: план самого
+# подзапроса проверяется своими строками.
+FULL_SCAN = re.compile(
+    r'^SCAN (?!CONSTANT ROW)(?!subquery)(?!.* USING .*INDEX)'
+)
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (ORDER|GROUP) BY')
+
+
+def explain(sql):
+    """Строки EXPLAIN QUERY PLAN для запроса с подставленными параметрами."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql):
+    return [
+        detail for detail in explain(sql)
+        if FULL_SCAN.search(detail) or TEMP_SORT.search(detail)
+    ]
+
+
+class QueryPlanMixin:
+    """Проверки планов запросов SQLite для TestCase."""
+
+    def assertQueryPlansUseIndexes(self, func, tables):
+        """Выполняет func и проверяет планы всех SELECT к таблицам tables."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN есть только в SQLite')
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(
+                f'FROM "{table}"' in sql for table in tables
+            ):
+                continue
+            checked += 1
+            problems = plan_problems(sql)
+            self.assertFalse(problems, f'{sql}\n' + '\n'.join(problems))
+        self.assertTrue(checked, f'Нет запросов к таблицам {tables}')
@@ -0,0 +1,43 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags.cache import CacheNode, do_cache
+
+register = template.Library()
+
+
+class FragmentCacheNode(CacheNode):
+    """{% cache %}, который снимает блокировку StampedeCache, если
+    отрисовка фрагмента упала: иначе остальные запросы ждали бы ее
+    до LOCK_TIMEOUT."""
+
+    def render(self, context):
+        try:
+            return super().render(context)
+        except Exception:
+            self.release(context)
+            raise
+
+    def release(self, context):
+        if self.cache_name:
+            fragment_cache = caches[self.cache_name.resolve(context)]
+        else:
+            try:
+                fragment_cache = caches['template_fragments']
+            except InvalidCacheBackendError:
+                fragment_cache = caches['default']
+        if hasattr(fragment_cache, 'release'):
+            fragment_cache.release(make_template_fragment_key(
+                self.fragment_name,
+                [var.resolve(context) for var in self.vary_on]
+            ))
+
+
+@register.tag('cache')
+def do_fragment_cache(parser, token):
+    """Тот же синтаксис, что у {% cache %} из django.templatetags.cache."""
+    node = do_cache(parser, token)
+    return FragmentCacheNode(
+        node.nodelist, node.expire_time_var, node.fragment_name,
+        node.vary_on, node.cache_name
+    )
@@ -6,3 +6,8 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.filter
+def page_window(page_obj):
+    return page_obj.paginator.get_elided_page_range(page_obj.number)
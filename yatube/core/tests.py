@@ -1,6 +1,42 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from http import HTTPStatus
+from unittest.mock import patch
 
-from django.test import Client, TestCase
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Context, Template
+from django.db import connection
+from django.test import (
+    Client, SimpleTestCase, TestCase, override_settings
+)
+
+from .cache import SQLiteCache, StampedeCache
+from .db import tune_sqlite
+from .warmup import STEPS, warm_up
+from .query_plans import plan_problems
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+CACHE_LOCATION = os.path.join(TEMP_CACHE_DIR, 'cache.sqlite3')
+
+
+def open_cache(**options):
+    return SQLiteCache(CACHE_LOCATION, {'OPTIONS': options})
+
+
+# Одновременных запросов в нагрузочных тестах.
+CONCURRENCY = 20
+RANDOM = 'core.cache.random.random'
+
+
+def increment(times):
+    cache = open_cache()
+    for _ in range(times):
+        cache.incr('counter')
 
 
 class CorePageTest(TestCase):
@@ -14,3 +50,213 @@ class CorePageTest(TestCase):
         response = self.client.get('/test404/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class QueryPlanTest(TestCase):
+    def test_plan_problems(self):
+        """Проверяем что полный проход и сортировка без индекса находятся."""
+        problems = plan_problems(
+            'SELECT * FROM "auth_user" ORDER BY "auth_user"."last_name"'
+        )
+        self.assertEqual(
+            problems, ['SCAN auth_user', 'USE TEMP B-TREE FOR ORDER BY']
+        )
+        self.assertFalse(plan_problems(
+            'SELECT * FROM "auth_user" WHERE "auth_user"."username" = \'x\''
+        ))
+
+
+class SQLitePragmaTest(TestCase):
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -1000})
+    def test_pragmas_applied(self):
+        """Проверяем что SQLITE_PRAGMAS выставляются соединению."""
+        tune_sqlite(None, connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone(), (-1000,))
+
+
+class WarmUpTest(SimpleTestCase):
+    def test_all_steps_timed(self):
+        """Проверяем что прогрев проходит все шаги и замеряет их."""
+        timings = warm_up()
+        self.assertEqual(list(timings), [name for name, _ in STEPS])
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.cache = open_cache()
+        self.cache.clear()
+
+    def test_values_shared_between_instances(self):
+        """Проверяем что значение видно через другое соединение."""
+        self.cache.set('key', {'value': [1, 2]})
+        other = open_cache()
+        self.assertEqual(other.get('key'), {'value': [1, 2]})
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_and_expiration(self):
+        """Проверяем add и истечение времени жизни."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache.set('expired', 1, timeout=0)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.add('expired', 2))
+
+    def test_incr_atomic_across_processes(self):
+        """Проверяем что incr из нескольких процессов не теряется."""
+        self.cache.set('counter', 0, None)
+        with ProcessPoolExecutor(4) as pool:
+            list(pool.map(increment, [50] * 4))
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_used_evicted(self):
+        """Проверяем что при переполнении вытесняются давно не читавшиеся
+        ключи."""
+        cache = open_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3, CULL_EVERY=1)
+        for i, accessed in enumerate((3, 1, 2)):
+            cache.set(f'key{i}', i)
+            cache._write(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                (accessed, cache.make_key(f'key{i}'))
+            )
+        cache.set('new', 3)
+        self.assertEqual(
+            cache.get_many(['key0', 'key1', 'key2', 'new']),
+            {'key0': 0, 'key2': 2, 'new': 3}
+        )
+
+    def test_cull_every_n_writes(self):
+        """Проверяем что лишние ключи удаляются раз в CULL_EVERY записей,
+        а не на каждой."""
+        cache = open_cache(MAX_ENTRIES=2, CULL_FREQUENCY=0, CULL_EVERY=3)
+        count = 'SELECT COUNT(*) FROM cache'
+        for i in range(5):
+            cache.set(f'key{i}', i)
+        # Третья запись ужала таблицу до двух ключей, еще две - без проверки.
+        self.assertEqual(cache._connection().execute(count).fetchone(), (4,))
+        cache.set('key5', 5)
+        self.assertEqual(cache._connection().execute(count).fetchone(), (2,))
+
+
+class SlowQuery:
+    """Долгий запрос к базе, который считает свои вызовы."""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.1)
+        return 'posts'
+
+
+class StampedeCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = StampedeCache('default', {})
+        self.query = SlowQuery()
+
+    def fetch(self, key='key'):
+        value = self.cache.get(key)
+        if value is None:
+            value = self.query()
+            self.cache.set(key, value, 60)
+        return value
+
+    def concurrently(self, function):
+        barrier = threading.Barrier(CONCURRENCY)
+
+        def request(_):
+            barrier.wait()
+            return function()
+
+        with ThreadPoolExecutor(CONCURRENCY) as pool:
+            return list(pool.map(request, range(CONCURRENCY)))
+
+    def expire(self, key):
+        # Срок свежести в прошлом, но значение еще хранится.
+        value, _, delta = cache.get(key)
+        cache.set(key, (value, time.time() - 1, delta), 60)
+
+    def test_single_flight_on_miss(self):
+        """Проверяем что при промахе значение считает один запрос,
+        а остальные дожидаются его."""
+        self.assertEqual(
+            self.concurrently(self.fetch), ['posts'] * CONCURRENCY
+        )
+        self.assertEqual(self.query.calls, 1)
+
+    def test_stale_served_while_revalidating(self):
+        """Проверяем что устаревшее значение отдается, пока один запрос
+        его пересчитывает."""
+        self.cache.set('key', 'old', 60)
+        self.expire('key')
+        results = self.concurrently(self.fetch)
+        self.assertEqual(self.query.calls, 1)
+        self.assertEqual(results.count('old'), CONCURRENCY - 1)
+        self.assertEqual(self.cache.get('key'), 'posts')
+
+    def test_early_recompute(self):
+        """Проверяем что незадолго до срока значение иногда пересчитывается
+        заранее, тем раньше, чем дольше пересчет."""
+        cache.set('key', ('old', time.time() + 1, 10), 60)
+        with patch(RANDOM, return_value=0.5):
+            self.assertIsNone(self.cache.get('key'))
+        self.cache.release('key')
+        cache.set('key', ('old', time.time() + 1, 0.01), 60)
+        with patch(RANDOM, return_value=0.5):
+            self.assertEqual(self.cache.get('key'), 'old')
+
+    def test_released_lock_passed_on(self):
+        """Проверяем что после release значение считает следующий запрос,
+        не дожидаясь LOCK_TIMEOUT."""
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.release('key')
+        started = time.monotonic()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_failed_render_releases_lock(self):
+        """Проверяем что упавшая отрисовка {% cache %} снимает
+        блокировку ключа."""
+        def broken():
+            raise ValueError
+
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% cache 60 broken %}{{ broken }}{% endcache %}'
+        )
+        with self.assertRaises(ValueError):
+            template.render(Context({'broken': broken}))
+        key = make_template_fragment_key('broken')
+        self.assertFalse(cache.has_key(f'{key}:lock'))
+        self.assertFalse(caches['template_fragments']._recomputing())
+
+    def test_fragment_queries_flat_under_load(self):
+        """Проверяем что при истечении {% cache %} под нагрузкой число
+        запросов к базе не растет с числом одновременных запросов."""
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% cache 60 index_page %}{{ query }}{% endcache %}'
+        )
+        key = make_template_fragment_key('index_page')
+        for wave in range(3):
+            with self.subTest(wave=wave):
+                results = self.concurrently(
+                    lambda: template.render(Context({'query': self.query}))
+                )
+                self.assertEqual(set(results), {'posts'})
+                self.assertEqual(self.query.calls, wave + 1)
+                self.expire(key)
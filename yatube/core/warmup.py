@@ -0,0 +1,78 @@
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.urls import get_resolver, resolve
+from django.utils import translation
+from PIL import Image
+from sorl.thumbnail import default
+
+logger = logging.getLogger(__name__)
+
+
+def urls():
+    # Разбор urlconf и словари обратного поиска всех пространств имен
+    # строятся при первом resolve и reverse.
+    resolver = get_resolver()
+    resolve('/')
+    resolver.reverse_dict
+    for _, namespace in resolver.namespace_dict.values():
+        namespace.reverse_dict
+
+
+def templates():
+    # С кэширующим загрузчиком шаблоны остаются разобранными, без
+    # него - хотя бы загружены библиотеки тегов.
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    if name.endswith('.html'):
+                        engine.get_template(os.path.relpath(
+                            os.path.join(root, name), directory
+                        ))
+
+
+def thumbnails():
+    # Объекты sorl ленивые: обращение к атрибуту импортирует и создает их.
+    for lazy in (default.backend, default.kvstore, default.engine,
+                 default.storage):
+        lazy.__class__
+    Image.init()
+
+
+def translations():
+    # Каталоги всех приложений читаются при первом переводе на язык
+    # и остаются в памяти процесса. Сейчас Django переводит имена
+    # промежуточных моделей ManyToMany еще при загрузке моделей, и шаг
+    # почти ничего не стоит; он страхует от ленивых verbose_name.
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('Page not found')
+
+
+STEPS = (
+    ('urls', urls),
+    ('templates', templates),
+    ('thumbnails', thumbnails),
+    ('translations', translations),
+)
+
+
+def warm_up():
+    """Делает при загрузке воркера то, за что иначе заплатит первый
+    запрос. Возвращает время каждого шага в секундах."""
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - started
+    # С --preload сервер загружает приложение до fork: соединение
+    # с базой не должно достаться воркерам.
+    connections.close_all()
+    logger.info('Прогрев воркера: %s', ', '.join(
+        f'{name} {seconds * 1000:.1f} мс' for name, seconds in timings.items()
+    ))
+    return timings
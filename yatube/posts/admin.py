@@ -1,9 +1,23 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import COMMENT, POST, match_expression, matching_ids
 
 
-class PostsAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """Поиск по индексу posts_search вместо LIKE '%q%' по search_fields."""
+    search_kind = POST
+
+    def get_search_results(self, request, queryset, search_term):
+        match = match_expression(search_term)
+        if not match:
+            return queryset, False
+        return queryset.filter(
+            pk__in=matching_ids(match, self.search_kind)
+        ), False
+
+
+class PostsAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -29,7 +43,8 @@ class GroupAdmin(admin.ModelAdmin):
     list_filter = ('slug',)
 
 
-class CommentsAdmin(admin.ModelAdmin):
+class CommentsAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = COMMENT
     list_display = (
         'pk',
         'post',
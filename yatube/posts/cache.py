@@ -0,0 +1,84 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+from yatube.settings import FEED_CACHE_TIMEOUT
+
+FEED_VERSION_KEY = 'posts:feed_version'
+FEED_CHANGED_KEY = 'posts:feed_changed_at'
+FOLLOW_VERSION_KEY = 'posts:follow_version:{}'
+PAGE_VERSION_KEY = 'posts:page_version'
+PAGE_PARAMS = ('page', 'after', 'before')
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Начинаем с текущего времени, а не с единицы: после вытеснения
+        # ключа версия не повторится и старые фрагменты не оживут.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ вытеснен: новая версия начнется с текущего времени и
+        # не совпадет с выданными раньше.
+        _version(key)
+
+
+def feed_version():
+    return _version(FEED_VERSION_KEY)
+
+
+def bump_feed_version():
+    _bump(FEED_VERSION_KEY)
+    cache.set(FEED_CHANGED_KEY, time.time(), None)
+
+
+def feed_changed_at():
+    """Время последнего изменения постов, групп или авторов для
+    Last-Modified. Одновременные правки могут дать одно время, поэтому
+    ETag лент строится по feed_version()."""
+    changed = cache.get(FEED_CHANGED_KEY)
+    if changed is None:
+        cache.add(FEED_CHANGED_KEY, time.time(), None)
+        changed = cache.get(FEED_CHANGED_KEY)
+    return datetime.fromtimestamp(changed, timezone.utc)
+
+
+def follow_version(user_id):
+    return _version(FOLLOW_VERSION_KEY.format(user_id))
+
+
+def bump_follow_version(user_id):
+    _bump(FOLLOW_VERSION_KEY.format(user_id))
+
+
+def page_version():
+    return _version(PAGE_VERSION_KEY)
+
+
+def bump_page_version():
+    _bump(PAGE_VERSION_KEY)
+
+
+def page_key(request):
+    return '&'.join(
+        f'{name}={request.GET[name]}'
+        for name in PAGE_PARAMS if name in request.GET
+    )
+
+
+def feed_cache_context(request, *versions):
+    """Переменные для {% cache %} ленты: время жизни, версия данных и
+    параметры страницы."""
+    return {
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
+        'feed_version': '.'.join(str(version) for version in versions),
+        'page_key': page_key(request),
+    }
@@ -0,0 +1,94 @@
+import hashlib
+
+from django.db.models import Exists, OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from yatube.settings import SHARED_CACHE_LOCATION
+
+from .cache import feed_changed_at, feed_version
+from .models import Comment, Follow, Post, User
+
+
+def page_etag(request, state):
+    """ETag страницы с состоянием state для текущего пользователя.
+
+    Общий для view и кэша страниц: клиент получает 304 по ETag,
+    выданному любым из них.
+    """
+    if state is None:
+        return None
+    raw = repr((request.get_full_path(), request.user.pk, state))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional(state):
+    """condition() с валидаторами из state(request, **kwargs).
+
+    state возвращает время последнего изменения страницы и прочие
+    данные, от которых она зависит, не трогая шаблоны. Из них,
+    пользователя и адреса с параметрами собирается ETag: неизменившаяся
+    страница отвечает 304. state вызывается один раз на запрос;
+    None - валидаторов нет, страница отдается целиком. Функция
+    состояния остается у view в page_state для кэша страниц.
+    """
+    def page_state(request, **kwargs):
+        if not hasattr(request, 'page_state'):
+            request.page_state = state(request, **kwargs)
+        return request.page_state
+
+    def etag(request, **kwargs):
+        return page_etag(request, page_state(request, **kwargs))
+
+    def last_modified(request, **kwargs):
+        state = page_state(request, **kwargs)
+        return state and state[0]
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=last_modified)(
+            view
+        )
+        view.page_state = page_state
+        return view
+
+    return decorator
+
+
+def feed_state(request, **kwargs):
+    # Версия лент меняется при любой правке постов, групп и авторов,
+    # ETag строится по ней, время изменения идет только в Last-Modified.
+    # В кэше своего процесса сброс версии соседним воркером не виден,
+    # и страница отвечала бы 304 на устаревшую ленту.
+    if not SHARED_CACHE_LOCATION:
+        return None
+    return feed_changed_at(), feed_version()
+
+
+def profile_state(request, username):
+    if not SHARED_CACHE_LOCATION:
+        return None
+    # Подписки версию лент не меняют: счетчики и кнопка подписки
+    # читаются одним запросом.
+    row = User.objects.filter(username=username).annotate(
+        is_followed=Exists(Follow.objects.filter(
+            user_id=request.user.pk, author=OuterRef('pk')
+        ))
+    ).values_list(
+        'is_followed', 'counters__followers_count', 'counters__following_count'
+    ).order_by()[:1]
+    return feed_changed_at(), (feed_version(), list(row))
+
+
+def post_detail_state(request, post_id):
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by('-pub_date').values('pub_date')[:1]
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment)
+    ).values_list(
+        'updated_at', 'last_comment', 'comments_count',
+        'author__counters__posts_count'
+    ).order_by()[:1]
+    row = next(iter(row), None)
+    if row is None:
+        return None
+    return max(filter(None, row[:2])), row[2:]
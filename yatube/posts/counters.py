@@ -0,0 +1,94 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, MediaFile, Post, User, UserCounters
+
+
+def _change(queryset, field, delta):
+    # Разошедшийся счетчик не уходит в минус: его поправит recount.
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_user_counter(user_id, field, delta):
+    _change(UserCounters.objects.filter(user_id=user_id), field, delta)
+
+
+def change_comments_count(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def change_media_refs(name, delta):
+    if delta > 0:
+        MediaFile.objects.bulk_create(
+            [MediaFile(name=name)], ignore_conflicts=True
+        )
+    _change(MediaFile.objects.filter(name=name), 'refs', delta)
+
+
+def _count_of(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(
+        Subquery(
+            rows.values(field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def recount_users(user_ids):
+    """Пересчитывает счетчики пользователей, создавая недостающие строки."""
+    rows = User.objects.filter(pk__in=user_ids).annotate(
+        real_posts=_count_of(Post, 'author'),
+        real_followers=_count_of(Follow, 'author'),
+        real_following=_count_of(Follow, 'user'),
+    ).values_list('pk', 'real_posts', 'real_followers', 'real_following')
+    counters = [
+        UserCounters(
+            user_id=pk,
+            posts_count=posts,
+            followers_count=followers,
+            following_count=following
+        )
+        for pk, posts, followers, following in rows
+    ]
+    UserCounters.objects.bulk_create(counters, ignore_conflicts=True)
+    UserCounters.objects.bulk_update(
+        counters, ['posts_count', 'followers_count', 'following_count']
+    )
+    return len(counters)
+
+
+def recount_posts(post_ids):
+    posts = list(Post.objects.filter(pk__in=post_ids).annotate(
+        real_comments=_count_of(Comment, 'post')
+    ).exclude(comments_count=F('real_comments')).only('pk'))
+    for post in posts:
+        post.comments_count = post.real_comments
+    Post.objects.bulk_update(posts, ['comments_count'])
+    return len(posts)
+
+
+def counters_for(user):
+    """Счетчики пользователя; если строки еще нет - считает их на месте."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        recount_users([user.pk])
+        return UserCounters.objects.get(user_id=user.pk)
+
+
+def recount_media(names):
+    """Пересчитывает ссылки на файлы картинок, создавая недостающие строки."""
+    refs = dict.fromkeys(names, 0)
+    refs.update(
+        Post.objects.filter(image__in=names).order_by().values(
+            'image'
+        ).annotate(refs=Count('pk')).values_list('image', 'refs')
+    )
+    files = [MediaFile(name=name, refs=count) for name, count in refs.items()]
+    MediaFile.objects.bulk_create(files, ignore_conflicts=True)
+    MediaFile.objects.bulk_update(files, ['refs'])
+    return len(files)
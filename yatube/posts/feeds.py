@@ -0,0 +1,68 @@
+import heapq
+from itertools import islice
+
+from yatube.settings import FEED_MAX_OFFSET
+
+from .models import Post, TimelineEntry
+from .paginators import keyset_window
+from .timeline import pulled_authors
+
+
+def _feed_key(post):
+    return post.pub_date, post.pk
+
+
+class HybridFeed:
+    """Лента подписок: посты обычных авторов читаются из TimelineEntry
+    (разданы при публикации), посты популярных авторов - напрямую из Post.
+
+    Потоки уже отсортированы по (pub_date, pk), поэтому сливаются через
+    кучу. Объект годится и для CursorPaginator (``keyset_window``), и для
+    обычного Paginator (``count`` и срезы). Срез читает из каждого потока
+    все строки до своего конца, поэтому страницы с номерами заканчиваются
+    на FEED_MAX_OFFSET.
+    """
+
+    def __init__(self, user, pulled=None):
+        self.user = user
+        self.pulled = pulled_authors(user) if pulled is None else pulled
+
+    def _pushed(self):
+        return TimelineEntry.objects.filter(user=self.user).exclude(
+            author_id__in=self.pulled
+        )
+
+    def _streams(self, cursor, backwards, limit):
+        entries = keyset_window(
+            self._pushed().select_related('post__author', 'post__group'),
+            cursor, backwards, limit, pk_field='post_id'
+        )
+        yield [entry.post for entry in entries]
+        for author_id in self.pulled:
+            yield keyset_window(
+                Post.objects.for_feed().filter(author_id=author_id),
+                cursor, backwards, limit
+            )
+
+    def keyset_window(self, cursor, backwards, limit):
+        merged = heapq.merge(
+            *self._streams(cursor, backwards, limit),
+            key=_feed_key,
+            reverse=not backwards
+        )
+        return list(islice(merged, limit))
+
+    def count(self):
+        pulled = Post.objects.filter(author_id__in=self.pulled).order_by()
+        return min(
+            self._pushed().order_by()[:FEED_MAX_OFFSET].count()
+            + pulled[:FEED_MAX_OFFSET].count(),
+            FEED_MAX_OFFSET
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            stop = min(index.stop, FEED_MAX_OFFSET)
+            rows = self.keyset_window(None, False, stop)
+            return rows[index.start:stop]
+        return self[index:index + 1][0]
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
+from .uploads import check_size, sanitize, too_large
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +10,24 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Слишком большой файл записан не целиком: убираем его до того,
+        # как ImageField попробует его открыть, и отказываем в clean_image.
+        upload = self.files.get('image')
+        self.oversized = upload if upload and too_large(upload) else None
+        if self.oversized:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.oversized:
+            check_size(self.oversized)
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return sanitize(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,78 @@
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+
+from .forms import CommentForm
+from .models import Follow
+
+# Дырка в кэшированной странице: имя фрагмента и его аргументы
+# в base64 от JSON. Полностью отрисованный фрагмент окружен маркерами,
+# в кэше остается только открывающий.
+HOLE = '<!--hole:{}-->'
+END = '<!--endhole-->'
+RENDERED = re.compile(rb'<!--hole:([\w=-]+)-->(.*?)<!--endhole-->', re.S)
+EMPTY = re.compile(rb'<!--hole:([\w=-]+)-->')
+
+
+def _following(request, username):
+    return {
+        'following': request.user.is_authenticated
+        and Follow.objects.filter(
+            user=request.user, author__username=username
+        ).exists()
+    }
+
+
+def _comment_form(request, post_id):
+    return {'form': CommentForm()}
+
+
+# Имя фрагмента -> шаблон и функция, которая досчитывает для него
+# контекст, когда страница взята из кэша и view не вызывалась.
+HOLES = {
+    'user_menu': ('includes/user_menu.html', None),
+    'switcher': ('posts/includes/switcher.html', None),
+    'follow_button': ('posts/includes/follow_button.html', _following),
+    'post_edit_link': ('posts/includes/post_edit_link.html', None),
+    'comment_form': ('posts/includes/comment_form.html', _comment_form),
+}
+
+
+def encode(name, kwargs):
+    raw = json.dumps([name, kwargs], sort_keys=True, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode(token):
+    return json.loads(base64.urlsafe_b64decode(token))
+
+
+def render(request, token):
+    """Отрисовывает фрагмент по токену из кэшированной страницы."""
+    name, kwargs = decode(token)
+    template, extra = HOLES[name]
+    context = dict(kwargs)
+    if extra:
+        context.update(extra(request, **kwargs))
+    return render_to_string(template, context, request)
+
+
+def punch(content):
+    """Страница для кэша: отрисованные фрагменты заменены дырками."""
+    return RENDERED.sub(lambda match: HOLE.format(
+        match[1].decode()
+    ).encode(), content)
+
+
+def strip(content):
+    """Страница для ответа: маркеры убраны, фрагменты остаются."""
+    return RENDERED.sub(lambda match: match[2], content)
+
+
+def fill(request, content):
+    """Дорисовывает фрагменты текущего пользователя в страницу из кэша."""
+    return EMPTY.sub(
+        lambda match: render(request, match[1].decode()).encode(), content
+    )
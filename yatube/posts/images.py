@@ -0,0 +1,33 @@
+import hashlib
+
+from PIL import Image
+
+
+def file_digest(file):
+    """Размер в байтах и SHA-256 файла, читая его кусками."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return size, digest.hexdigest()
+
+
+def fill_metadata(post, file):
+    """Заполняет у поста размеры, вес и хэш картинки из открытого файла.
+
+    Pillow читает только заголовок: картинка целиком не декодируется.
+    """
+    post.image_size, post.image_hash = file_digest(file)
+    # Хэш остается и на файле: хранилище возьмет из него имя, не читая
+    # файл второй раз.
+    file.sha256 = post.image_hash
+    with Image.open(file) as image:
+        post.image_width, post.image_height = image.size
+    file.seek(0)
+
+
+def clear_metadata(post):
+    post.image_width = post.image_height = post.image_size = None
+    post.image_hash = ''
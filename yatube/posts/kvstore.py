@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.db import transaction
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as DBKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from yatube.settings import THUMBNAIL_LOCAL_SIZE, THUMBNAIL_LOCAL_TIMEOUT
+
+
+class KVStore(DBKVStore):
+    """Хранилище ключей sorl в три уровня: словарь процесса, общий кэш
+    THUMBNAIL_CACHE и таблица в базе. Запись идет сразу во все три.
+
+    ``stats`` считает, на каком уровне нашелся ключ: local_hits,
+    cache_hits или misses - тогда был запрос в базу.
+
+    Словарь процесса общий для потоков воркера и меняется только под
+    ``lock``; запросы в кэш и базу идут без блокировки.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def _remember(self, key, value):
+        expires = time.monotonic() + THUMBNAIL_LOCAL_TIMEOUT
+        with self.lock:
+            self.local[key] = (expires, value)
+            self.local.move_to_end(key)
+            while len(self.local) > THUMBNAIL_LOCAL_SIZE:
+                self.local.popitem(last=False)
+
+    def _local_get(self, key):
+        with self.lock:
+            entry = self.local.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self.local.move_to_end(key)
+            return entry
+
+    def _get_raw(self, key):
+        entry = self._local_get(key)
+        if entry is not None:
+            self.stats['local_hits'] += 1
+            value = entry[1]
+        else:
+            value = self.cache.get(key)
+            if value is None:
+                self.stats['misses'] += 1
+                value = KVStoreModel.objects.filter(key=key).values_list(
+                    'value', flat=True
+                ).first() or EMPTY_VALUE
+                self.cache.set(
+                    key, value, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+                )
+            else:
+                self.stats['cache_hits'] += 1
+            self._remember(key, value)
+        if value == EMPTY_VALUE:
+            return None
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def set_many(self, items):
+        """Записывает пачку сырых ключей одной транзакцией."""
+        with transaction.atomic():
+            KVStoreModel.objects.filter(key__in=list(items)).delete()
+            KVStoreModel.objects.bulk_create(
+                KVStoreModel(key=key, value=value)
+                for key, value in items.items()
+            )
+        self.cache.set_many(items, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        for key, value in items.items():
+            self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        with self.lock:
+            for key in keys:
+                self.local.pop(key, None)
+
+    def clear_local(self):
+        """Забывает ключи в памяти процесса и обнуляет счетчики."""
+        with self.lock:
+            self.local.clear()
+        self.stats.clear()
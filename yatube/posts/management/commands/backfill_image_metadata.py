@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from yatube.settings import MAINTENANCE_BATCH_SIZE
+
+from posts.images import fill_metadata
+from posts.models import Post
+
+FIELDS = ['image_width', 'image_height', 'image_size', 'image_hash']
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры, вес и хэш картинок у постов, где их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MAINTENANCE_BATCH_SIZE,
+            help='Сколько постов обновлять за раз'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            Q(image_hash='') | Q(image_width__isnull=True)
+            | Q(image_size__isnull=True)
+        ).order_by('pk').only('pk', 'image', *FIELDS)
+        last_pk = 0
+        filled = 0
+        missing = 0
+        while True:
+            chunk = list(posts.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not chunk:
+                break
+            updated = []
+            for post in chunk:
+                try:
+                    with post.image.open('rb') as file:
+                        fill_metadata(post, file)
+                except (OSError, ValueError):
+                    missing += 1
+                    self.stderr.write(f'Не прочитать {post.image.name}')
+                    continue
+                updated.append(post)
+            Post.objects.bulk_update(updated, FIELDS)
+            filled += len(updated)
+            last_pk = chunk[-1].pk
+            self.stdout.write(f'Заполнено: {filled}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, заполнено: {filled}, не прочитано: {missing}'
+        ))
@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from yatube.settings import POSTS_ON_PAGE
+
+from core.benchmarks import measure, print_table, scratch_database
+from posts import counters, timeline
+from posts.feeds import HybridFeed
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+def create_users(prefix, count):
+    User.objects.bulk_create(
+        User(username=f'{prefix}{i}') for i in range(count)
+    )
+    return list(User.objects.filter(
+        username__startswith=prefix
+    ).values_list('pk', flat=True))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает pull, push и гибридную ленту подписок на синтетическом '
+        'графе подписок во временной базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followees', type=int, nargs='+', default=[10, 100, 1000],
+            help='На сколько авторов подписан читатель'
+        )
+        parser.add_argument(
+            '--followers', type=int, nargs='+',
+            default=[10, 100, 1000, 10000],
+            help='Сколько подписчиков у публикующего автора'
+        )
+        parser.add_argument('--posts-per-author', type=int, default=20)
+        parser.add_argument(
+            '--pulled', type=int, default=3,
+            help='Сколько популярных авторов гибридная лента читает напрямую'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.bench_reads(options)
+            self.bench_writes(options)
+
+    def bench_reads(self, options):
+        rows = []
+        for run, followees in enumerate(options['followees']):
+            reader = User.objects.create(username=f'reader{run}')
+            authors = create_users(f'r{run}author', followees)
+            Follow.objects.bulk_create(
+                Follow(user=reader, author_id=author_id)
+                for author_id in authors
+            )
+            Post.objects.bulk_create(
+                Post(author_id=author_id, text='Синтетический пост')
+                for author_id in authors
+                for _ in range(options['posts_per_author'])
+            )
+            TimelineEntry.objects.bulk_create(
+                TimelineEntry(
+                    user=reader,
+                    post_id=pk,
+                    author_id=author_id,
+                    pub_date=pub_date
+                )
+                for pk, author_id, pub_date in Post.objects.filter(
+                    author_id__in=authors
+                ).values_list('pk', 'author_id', 'pub_date')
+            )
+            pulled = authors[:options['pulled']]
+            limit = POSTS_ON_PAGE + 1
+            pull = measure(lambda: list(Post.objects.filter(
+                author__following__user=reader
+            )[:limit]), options['repeat'])
+            push = measure(lambda: [
+                entry.post for entry in TimelineEntry.objects.filter(
+                    user=reader
+                ).select_related('post')[:limit]
+            ], options['repeat'])
+            hybrid = measure(
+                lambda: HybridFeed(reader, pulled).keyset_window(
+                    None, False, limit
+                ),
+                options['repeat']
+            )
+            rows.append((followees, len(pulled), pull, push, hybrid))
+        print_table(
+            self.stdout,
+            'Чтение первой страницы ленты подписок, мс (медиана)',
+            ('подписок', 'pull-автор.', 'pull', 'push', 'hybrid'),
+            rows
+        )
+
+    def bench_writes(self, options):
+        rows = []
+        for run, followers in enumerate(options['followers']):
+            author = User.objects.create(username=f'writer{run}')
+            Follow.objects.bulk_create(
+                Follow(user_id=user_id, author=author)
+                for user_id in create_users(f'w{run}follower', followers)
+            )
+            # bulk_create обходит сигналы, счетчик подписчиков считаем сами.
+            counters.recount_users([author.pk])
+
+            def publish(strategy):
+                Post.objects.bulk_create([
+                    Post(author=author, text='Синтетический пост')
+                ])
+                strategy(Post.objects.filter(author=author).latest('pk'))
+
+            push = measure(
+                lambda: publish(timeline.fan_out), options['repeat']
+            )
+            hybrid = measure(
+                lambda: publish(timeline.push_post), options['repeat']
+            )
+            rows.append((
+                followers,
+                'да' if timeline.is_pulled(author.pk) else 'нет',
+                push,
+                hybrid
+            ))
+        print_table(
+            self.stdout,
+            'Публикация поста, мс (медиана)',
+            ('подписчиков', 'pull', 'push', 'hybrid'),
+            rows
+        )
@@ -0,0 +1,66 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from yatube.settings import POSTS_ON_PAGE
+
+from core.benchmarks import measure, print_table, scratch_database
+from posts.models import Post
+from posts.search import search
+
+User = get_user_model()
+
+# Частое, обычное и редкое слово корпуса.
+QUERIES = ('слово0', 'слово500', 'слово49999')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск LIKE по тексту постов с полнотекстовым индексом '
+        'FTS5 на синтетическом корпусе во временной базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--words-per-post', type=int, default=30)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.fill(options)
+            rows = []
+            for query in QUERIES:
+                like = measure(lambda: list(Post.objects.for_feed().filter(
+                    text__icontains=query
+                )[:POSTS_ON_PAGE]), options['repeat'])
+                fts = measure(
+                    lambda: list(search(query, per_page=POSTS_ON_PAGE)),
+                    options['repeat']
+                )
+                rows.append((query, like, fts))
+            print_table(
+                self.stdout,
+                f'Первая страница поиска по {options["rows"]} постам, '
+                'мс (медиана)',
+                ('запрос', 'LIKE', 'FTS5'),
+                rows
+            )
+
+    def fill(self, options):
+        # Частоты слов по Ципфу: первые слова встречаются почти везде.
+        vocabulary = [f'слово{i}' for i in range(50_000)]
+        weights = [1 / (i + 1) for i in range(len(vocabulary))]
+        author = User.objects.create(username='bench')
+        created = 0
+        while created < options['rows']:
+            size = min(options['batch_size'], options['rows'] - created)
+            Post.objects.bulk_create(
+                Post(author=author, text=' '.join(random.choices(
+                    vocabulary, weights, k=options['words_per_post']
+                )))
+                for _ in range(size)
+            )
+            created += size
+            self.stdout.write(f'Создано постов: {created}')
@@ -0,0 +1,152 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from yatube.settings import BASE_DIR
+
+from core.benchmarks import print_table, scratch_database
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+BASELINE = 'yatube.settings'
+SETTINGS = [BASELINE, 'yatube.settings_production']
+# Переменные, без которых боевой профиль не запустится.
+ENVIRONMENT = {
+    'YATUBE_SECRET_KEY': 'bench',
+    'YATUBE_ALLOWED_HOSTS': 'testserver',
+}
+
+
+def start_response(status, headers):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает число запросов в секунду с настройками разработки '
+        'и боевыми: каждый профиль в своем процессе и своей временной базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+', default=SETTINGS,
+            help='Модули настроек для сравнения'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Сколько раз запрашивать каждый адрес'
+        )
+        parser.add_argument('--posts', type=int, default=100)
+        parser.add_argument(
+            '--child', action='store_true',
+            help='Замер в текущем профиле, результат - JSON'
+        )
+        parser.add_argument('--directory', help='Каталог для базы и кэша')
+
+    def handle(self, *args, **options):
+        if options['child']:
+            self.stdout.write(json.dumps(self.measure(options)))
+            return
+        rows = []
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as directory:
+                environment = {**ENVIRONMENT, **os.environ}
+                # Базовый профиль замеряется как есть, с кэшем в памяти;
+                # остальным - свой файл общего кэша, чтобы не задеть кэш
+                # работающего сервера.
+                environment.pop('YATUBE_SHARED_CACHE', None)
+                if profile != BASELINE:
+                    environment['YATUBE_SHARED_CACHE'] = os.path.join(
+                        directory, 'cache.sqlite3'
+                    )
+                result = subprocess.run(
+                    [
+                        sys.executable,
+                        os.path.join(BASE_DIR, 'manage.py'),
+                        'bench_settings', '--child',
+                        '--settings', profile,
+                        '--directory', directory,
+                        '--requests', str(options['requests']),
+                        '--posts', str(options['posts']),
+                    ],
+                    env=environment,
+                    stdout=subprocess.PIPE,
+                    check=True
+                )
+            measured = json.loads(result.stdout.decode().splitlines()[-1])
+            rows.append((profile, measured['guest'], measured['user']))
+            self.stdout.write(f'Готово: {profile}')
+        print_table(
+            self.stdout,
+            f'Запросов в секунду, по {options["requests"]} на адрес',
+            ('профиль', 'гость', 'пользователь'),
+            rows
+        )
+
+    def fill(self, posts):
+        author = User.objects.create(username='author')
+        reader = User.objects.create(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for i in range(posts):
+            post = Post.objects.create(
+                text=f'Синтетический пост {i}', author=author, group=group
+            )
+        Comment.objects.create(text='Комментарий', post=post, author=reader)
+        return reader, [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            reverse('posts:profile', kwargs={'username': author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            reverse('about:tech'),
+        ]
+
+    def run(self, urls, cookie, requests):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        environs = [
+            factory.get(url, HTTP_COOKIE=cookie).environ for url in urls
+        ]
+        started = time.perf_counter()
+        for _ in range(requests):
+            for environ in environs:
+                # Как WSGI-сервер: close() шлет request_finished, и
+                # соединение с базой закрывается или остается по
+                # CONN_MAX_AGE.
+                response = handler(dict(environ), start_response)
+                b''.join(response)
+                response.close()
+        return requests * len(urls) / (time.perf_counter() - started)
+
+    def measure(self, options):
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            options['directory'], 'bench.sqlite3'
+        )
+        with scratch_database():
+            reader, urls = self.fill(options['posts'])
+            client = Client()
+            client.force_login(reader)
+            cookie = '; '.join(
+                f'{name}={morsel.value}'
+                for name, morsel in client.cookies.items()
+            )
+            # Первый проход прогревает кэши и шаблоны.
+            self.run(urls, '', 1)
+            self.run(urls, cookie, 1)
+            return {
+                'guest': self.run(urls, '', options['requests']),
+                'user': self.run(urls, cookie, options['requests']),
+            }
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from yatube.settings import BASE_DIR
+
+from core.benchmarks import print_table
+
+# Свежий воркер: загрузка yatube.wsgi, затем два запроса подряд. Время
+# первого ответа - до первого куска тела, как его видит сервер.
+WORKER = '''
+import io
+import json
+import sys
+import time
+
+started = time.perf_counter()
+from yatube import wsgi
+loaded = time.perf_counter() - started
+
+
+def get(path):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.url_scheme': 'http',
+    }
+    started = time.perf_counter()
+    response = wsgi.application(environ, lambda status, headers: None)
+    chunks = iter(response)
+    next(chunks, b'')
+    ttfb = time.perf_counter() - started
+    b''.join(chunks)
+    response.close()
+    return ttfb
+
+
+first = [get(path) for path in sys.argv[1:]]
+second = [get(path) for path in sys.argv[1:]]
+print(json.dumps({
+    'load': loaded,
+    'first': sum(first),
+    'second': sum(second),
+    'warmup': wsgi.warmup_timings,
+}))
+'''
+# Строка -X importtime: "import time: self | cumulative | модуль".
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)')
+BASELINE = 'yatube.settings'
+ENVIRONMENT = {
+    'YATUBE_SECRET_KEY': 'bench',
+    'YATUBE_ALLOWED_HOSTS': 'testserver',
+}
+
+
+def owner(module, packages):
+    """Приложение, которому принадлежит модуль, по самому длинному
+    совпавшему пакету."""
+    for package in packages:
+        if module == package or module.startswith(f'{package}.'):
+            return package
+    return module.split('.')[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет запуск свежего WSGI-воркера без прогрева и с ним: '
+        'загрузку, время до первого байта первого и второго запросов '
+        'и время импортов по приложениям'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--paths', nargs='+',
+            default=['/', '/group/none/', '/about/tech/'],
+            help='Адреса первых запросов воркера'
+        )
+        parser.add_argument(
+            '--profile',
+            default=os.environ.get(
+                'DJANGO_SETTINGS_MODULE', BASELINE
+            ),
+            help='Модуль настроек воркера'
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def worker(self, directory, profile, warmup, paths):
+        environment = {
+            **ENVIRONMENT,
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': profile,
+            'YATUBE_DATABASE': os.path.join(directory, 'db.sqlite3'),
+            'YATUBE_WARMUP': '1' if warmup else '',
+        }
+        # Общий кэш, если он задан, у каждого воркера новый: иначе
+        # первый запрос возьмет страницу, отрисованную предыдущим.
+        if 'YATUBE_SHARED_CACHE' in os.environ or profile != BASELINE:
+            environment['YATUBE_SHARED_CACHE'] = os.path.join(
+                tempfile.mkdtemp(dir=directory), 'cache.sqlite3'
+            )
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', WORKER, *paths],
+            cwd=BASE_DIR,
+            env=environment,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        imports = defaultdict(int)
+        packages = sorted(
+            (config.name for config in apps.get_app_configs()),
+            key=len,
+            reverse=True
+        )
+        for line in result.stderr.decode().splitlines():
+            match = IMPORT_TIME.match(line)
+            if match:
+                imports[owner(match[2], packages)] += int(match[1])
+        return json.loads(result.stdout.decode().splitlines()[-1]), imports
+
+    def handle(self, *args, **options):
+        rows = []
+        steps = defaultdict(float)
+        imports = defaultdict(int)
+        with tempfile.TemporaryDirectory() as directory:
+            subprocess.run(
+                [sys.executable, 'manage.py', 'migrate', '-v', '0'],
+                cwd=BASE_DIR,
+                env={
+                    **os.environ,
+                    'YATUBE_DATABASE': os.path.join(directory, 'db.sqlite3'),
+                },
+                check=True
+            )
+            for warmup in (False, True):
+                runs = [
+                    self.worker(
+                        directory, options['profile'], warmup,
+                        options['paths']
+                    )
+                    for _ in range(options['repeat'])
+                ]
+                rows.append((
+                    'да' if warmup else 'нет',
+                    *(
+                        min(run[key] for run, _ in runs) * 1000
+                        for key in ('load', 'first', 'second')
+                    ),
+                ))
+                for run, run_imports in runs:
+                    for name, seconds in run['warmup'].items():
+                        steps[name] += seconds * 1000 / len(runs)
+                    # Без прогрева модуль yatube.wsgi не включает его
+                    # работу в собственное время импорта.
+                    if not warmup:
+                        for name, micros in run_imports.items():
+                            imports[name] += micros / 1000 / len(runs)
+        print_table(
+            self.stdout,
+            f'Свежий воркер {options["profile"]}, мс (лучший из '
+            f'{options["repeat"]}); запросы: {" ".join(options["paths"])}',
+            ('прогрев', 'загрузка', '1-й ответ', '2-й ответ'),
+            rows
+        )
+        print_table(
+            self.stdout,
+            'Шаги прогрева, мс',
+            ('шаг', 'мс'),
+            list(steps.items())
+        )
+        print_table(
+            self.stdout,
+            'Импорты при загрузке воркера по приложениям, мс',
+            ('пакет', 'мс'),
+            sorted(imports.items(), key=lambda item: -item[1])[:15]
+        )
@@ -0,0 +1,167 @@
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from yatube.settings import MAINTENANCE_BATCH_SIZE
+
+from posts import media
+from posts.models import ImageVariant, MediaFile, Post
+
+
+def batches(names, size):
+    names = iter(names)
+    while True:
+        batch = list(islice(names, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, вместе '
+        'с миниатюрами и ключами sorl. Кандидаты берутся из MediaFile без '
+        'ссылок, хранилище и база читаются пачками'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MAINTENANCE_BATCH_SIZE,
+            help='Сколько файлов проверять одним запросом'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено'
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Не больше стольких удалений в секунду; 0 - без ограничения'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд: пост с только '
+                 'что загруженной картинкой мог еще не сохраниться'
+        )
+        parser.add_argument(
+            '--scan',
+            action='store_true',
+            help='Обойти каталог картинок целиком: найти файлы, которых нет '
+                 'в MediaFile (сбой при сохранении поста, старые загрузки)'
+        )
+
+    def is_old(self, file_storage, name):
+        return file_storage.get_modified_time(name) < self.cutoff
+
+    def is_released(self, file_storage, name):
+        # Строка MediaFile могла пережить свой файл: она удаляется сразу.
+        return not file_storage.exists(name) or self.is_old(file_storage, name)
+
+    def old_files(self, file_storage, directory):
+        if not file_storage.exists(directory):
+            return
+        for name in media.walk(file_storage, directory):
+            if self.is_old(file_storage, name):
+                yield name
+
+    def collect(self, name, remove):
+        """Удаляет файл с учетом --rate или в пробном запуске только
+        печатает имя. Возвращает 1, если файл посчитан, иначе 0."""
+        if self.dry_run:
+            self.stdout.write(name)
+            return 1
+        if self.interval:
+            delay = self.next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.next_at = max(self.next_at, time.monotonic()) + self.interval
+        return 1 if remove(name) is not False else 0
+
+    def remove_source(self, name):
+        # С проверки пачки могло пройти время (--rate), а повторная
+        # загрузка той же картинки обновляет время изменения файла.
+        file_storage = media.storage()
+        if not self.is_released(file_storage, name):
+            return False
+        if not media.unreferenced([name]):
+            return False
+        media.remove(name)
+        MediaFile.objects.filter(name=name).delete()
+        return True
+
+    def collect_sources(self, batch_size):
+        # Без --scan кандидаты - файлы без ссылок по MediaFile, каталог
+        # не обходится. Ссылки из постов все равно проверяются: счетчик
+        # мог разойтись с данными до recount.
+        file_storage = media.storage()
+        if self.scan:
+            directory = Post._meta.get_field('image').upload_to
+            names = batches(
+                self.old_files(file_storage, directory), batch_size
+            )
+        else:
+            names = media.released(batch_size)
+        collected = 0
+        for batch in names:
+            for name in media.unreferenced(batch):
+                if self.scan or self.is_released(file_storage, name):
+                    collected += self.collect(name, self.remove_source)
+        return collected
+
+    def collect_variants(self, batch_size):
+        # Миниатюры картинок, исходник которых уже удален с диска.
+        # Существующие исходники разбирает collect_sources.
+        file_storage = media.storage()
+        sources = ImageVariant.objects.order_by('source').values_list(
+            'source', flat=True
+        ).distinct()
+        last_source = ''
+        collected = 0
+        while True:
+            chunk = list(sources.filter(source__gt=last_source)[:batch_size])
+            if not chunk:
+                return collected
+            for name in media.unreferenced(chunk):
+                if not file_storage.exists(name):
+                    collected += self.collect(name, self.remove_source)
+            last_source = chunk[-1]
+
+    def collect_thumbnails(self, batch_size):
+        # Миниатюры, на которые не ведет ни одна запись.
+        names = self.old_files(
+            default.storage, sorl_settings.THUMBNAIL_PREFIX
+        )
+        collected = 0
+        for batch in batches(names, batch_size):
+            for name in media.untracked_thumbnails(batch):
+                collected += self.collect(name, default.storage.delete)
+        return collected
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.scan = options['scan']
+        self.interval = 1 / options['rate'] if options['rate'] else 0
+        self.next_at = time.monotonic()
+        self.cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        batch_size = options['batch_size']
+        # Проходы не пересекаются, и имена не нужно запоминать: второй
+        # берет только исходники, которых нет на диске, третий - только
+        # миниатюры без записей.
+        sources = self.collect_sources(batch_size)
+        sources += self.collect_variants(batch_size)
+        thumbnails = self.collect_thumbnails(batch_size)
+        verb = 'Будет удалено' if self.dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} картинок: {sources}, лишних миниатюр: {thumbnails}'
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from core.benchmarks import print_table
+from posts.models import ImageVariant
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает суммарный размер миниатюр каждой ширины и формата '
+        'по сравнению с одной JPEG-миниатюрой наибольшей ширины'
+    )
+
+    def handle(self, *args, **options):
+        variants = ImageVariant.objects.values('width', 'format').annotate(
+            files=Count('pk'), total=Sum('size')
+        ).order_by('width', 'format')
+        rows = list(variants)
+        if not rows:
+            self.stdout.write('Миниатюр еще нет')
+            return
+        widest = max(row['width'] for row in rows)
+        baseline = next(
+            (
+                row['total'] for row in rows
+                if row['width'] == widest and row['format'] == 'jpg'
+            ),
+            None
+        )
+        print_table(
+            self.stdout,
+            'Размер миниатюр, КБ',
+            ('ширина', 'формат', 'файлов', 'КБ', '% от JPEG'),
+            [
+                (
+                    row['width'],
+                    row['format'],
+                    row['files'],
+                    row['total'] / 1024,
+                    100 * row['total'] / baseline if baseline else '-'
+                )
+                for row in rows
+            ]
+        )
@@ -0,0 +1,105 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from yatube.settings import BASE_DIR, MAINTENANCE_BATCH_SIZE
+
+from posts.models import Post
+from posts.thumbnails import render, store
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает миниатюры для всех картинок постов в несколько процессов. '
+        'Прерванный запуск продолжается с последней сохраненной пачки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MAINTENANCE_BATCH_SIZE,
+            help='Сколько постов читать из базы и сохранять за раз'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов; 0 - все в текущем процессе'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(BASE_DIR, '.thumbnails_checkpoint'),
+            help='Файл с pk последнего обработанного поста'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать сначала, не глядя на checkpoint'
+        )
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as checkpoint:
+                return int(checkpoint.read())
+        except (OSError, ValueError):
+            return 0
+
+    def write_checkpoint(self, path, last_pk):
+        # Запись через временный файл: прерванный запуск не оставит
+        # полупустой checkpoint.
+        with open(f'{path}.tmp', 'w') as checkpoint:
+            checkpoint.write(str(last_pk))
+        os.replace(f'{path}.tmp', path)
+
+    def handle(self, *args, **options):
+        path = options['checkpoint']
+        last_pk = 0 if options['restart'] else self.read_checkpoint(path)
+        if last_pk:
+            self.stdout.write(f'Продолжаем после поста {last_pk}')
+        posts = Post.objects.exclude(image='').order_by('pk').values_list(
+            'pk', 'image'
+        )
+        workers = options['workers']
+        # Дочерние процессы работают только с файлами, база - в этом.
+        pool = ProcessPoolExecutor(workers) if workers else None
+        started = time.monotonic()
+        done = failed = 0
+        try:
+            while True:
+                chunk = list(
+                    posts.filter(pk__gt=last_pk)[:options['batch_size']]
+                )
+                if not chunk:
+                    break
+                names = list(dict.fromkeys(name for _, name in chunk))
+                if pool:
+                    results = pool.map(
+                        render, names,
+                        chunksize=max(1, len(names) // (workers * 4))
+                    )
+                else:
+                    results = map(render, names)
+                rendered = [result for result in results if result]
+                store(rendered)
+                done += len(rendered)
+                failed += len(names) - len(rendered)
+                last_pk = chunk[-1][0]
+                self.write_checkpoint(path, last_pk)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Картинок: {done + failed}, '
+                    f'{done / elapsed:.1f} в секунду'
+                )
+        finally:
+            if pool:
+                pool.shutdown()
+        if os.path.exists(path):
+            os.remove(path)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, картинок: {done}, ошибок: {failed}, '
+            f'{done / elapsed if elapsed else 0:.1f} в секунду'
+        ))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from yatube.settings import TIMELINE_BATCH_SIZE
+
+from posts import timeline
+from posts.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает ленты подписок из Follow и Post пачками и '
+        'раскладывает посты авторов, опустившихся ниже порога подписчиков, '
+        'и отложенных подписок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TIMELINE_BATCH_SIZE,
+            help='Сколько пользователей и постов обрабатывать за раз'
+        )
+        parser.add_argument(
+            '--pending',
+            action='store_true',
+            help='Только дозаполнить ленты авторами ниже порога и '
+                 'отложенными подписками, без полной пересборки'
+        )
+
+    def backfill_pending(self, batch_size):
+        authors = timeline.backfill_pending(batch_size)
+        self.stdout.write(f'Дозаполнено лент по авторам: {authors}')
+        follows = timeline.backfill_follows(batch_size)
+        self.stdout.write(f'Дозаполнено лент по подпискам: {follows}')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['pending']:
+            self.backfill_pending(batch_size)
+            return
+        TimelineEntry.objects.exclude(
+            user_id__in=Follow.objects.values('user_id')
+        ).delete()
+        users = Follow.objects.order_by('user_id').values_list(
+            'user_id', flat=True
+        ).distinct()
+        last_user_id = 0
+        rebuilt = 0
+        while True:
+            chunk = list(users.filter(user_id__gt=last_user_id)[:batch_size])
+            if not chunk:
+                break
+            for user_id in chunk:
+                timeline.rebuild_user(user_id, batch_size)
+            rebuilt += len(chunk)
+            last_user_id = chunk[-1]
+            self.stdout.write(f'Пересобрано лент: {rebuilt}')
+        self.backfill_pending(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, пересобрано лент: {rebuilt}'
+        ))
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from yatube.settings import MAINTENANCE_BATCH_SIZE
+
+from posts.counters import recount_media, recount_posts, recount_users
+from posts.models import MediaFile, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики постов, подписчиков, подписок '
+        'комментариев и ссылок на картинки пачками'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MAINTENANCE_BATCH_SIZE,
+            help='Сколько пользователей и постов обрабатывать за раз'
+        )
+
+    def recount(self, model, recount_batch, batch_size):
+        ids = model.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = None
+        fixed = 0
+        while True:
+            rest = ids if last_pk is None else ids.filter(pk__gt=last_pk)
+            chunk = list(rest[:batch_size])
+            if not chunk:
+                return fixed
+            fixed += recount_batch(chunk)
+            last_pk = chunk[-1]
+
+    def recount_post_images(self, post_ids):
+        return recount_media(set(
+            Post.objects.filter(pk__in=post_ids).exclude(
+                image=''
+            ).values_list('image', flat=True)
+        ))
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = self.recount(User, recount_users, batch_size)
+        self.stdout.write(f'Пересчитано пользователей: {users}')
+        posts = self.recount(Post, recount_posts, batch_size)
+        # Сначала файлы постов, затем строки, на которые посты уже
+        # не ссылаются.
+        media = self.recount(Post, self.recount_post_images, batch_size)
+        media += self.recount(MediaFile, recount_media, batch_size)
+        self.stdout.write(f'Пересчитано ссылок на картинки: {media}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, исправлено счетчиков комментариев: {posts}'
+        ))
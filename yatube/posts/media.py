@@ -0,0 +1,79 @@
+import os
+
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import ImageVariant, MediaFile, Post
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def remove(name):
+    """Удаляет файл картинки, ее миниатюры и ключи sorl."""
+    default.backend.delete(ImageFile(name, storage()))
+    # Миниатюры, о которых не знает хранилище ключей sorl.
+    variants = ImageVariant.objects.filter(source=name)
+    for variant in variants.values_list('name', flat=True):
+        default.storage.delete(variant)
+    variants.delete()
+
+
+def walk(file_storage, directory):
+    """Имена файлов каталога локального хранилища со всеми подкаталогами.
+
+    Каталоги читаются потоком через os.scandir: в памяти только
+    открытые итераторы каталогов на текущем пути, а не списки их файлов.
+    """
+    with os.scandir(file_storage.path(directory)) as entries:
+        for entry in entries:
+            name = os.path.join(directory, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(file_storage, name)
+            else:
+                yield name
+
+
+def released(batch_size):
+    """Пачки имен файлов, у которых по MediaFile не осталось ссылок."""
+    files = MediaFile.objects.filter(refs=0).order_by('name').values_list(
+        'name', flat=True
+    )
+    last_name = ''
+    while True:
+        chunk = list(files.filter(name__gt=last_name)[:batch_size])
+        if not chunk:
+            return
+        yield chunk
+        last_name = chunk[-1]
+
+
+def unreferenced(names):
+    """Имена из пачки, на которые не ссылается ни один пост."""
+    referenced = set(
+        Post.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+    return [name for name in names if name not in referenced]
+
+
+def untracked_thumbnails(names):
+    """Миниатюры из пачки, о которых не знают ни ImageVariant,
+    ни хранилище ключей sorl."""
+    variants = set(
+        ImageVariant.objects.filter(name__in=names).values_list(
+            'name', flat=True
+        )
+    )
+    keys = {
+        add_prefix(ImageFile(name, default.storage).key): name
+        for name in names if name not in variants
+    }
+    known = set(
+        KVStoreModel.objects.filter(key__in=keys).values_list(
+            'key', flat=True
+        )
+    )
+    return [name for key, name in keys.items() if key not in known]
@@ -0,0 +1,152 @@
+import hashlib
+from calendar import timegm
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from yatube.settings import PAGE_CACHE_NAMESPACES, PAGE_CACHE_TIMEOUT
+
+from . import holes
+from .cache import page_version
+from .conditional import page_etag
+
+# Условные заголовки запроса: страницу для кэша view отрисовывает
+# целиком, 304 считается уже по сохраненной странице.
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+
+class PageCacheMiddleware:
+    """Кэш страниц целиком для GET-запросов к PAGE_CACHE_NAMESPACES.
+
+    В кэш попадают только страницы, отрисованные для анонима: без
+    cookie и токена CSRF. Личные фрагменты ({% hole %}) хранятся
+    дырками и дорисовываются для каждого запроса, поэтому одна
+    страница годится и анониму, и вошедшему пользователю. Ключ
+    содержит версию, которую сбрасывают сигналы моделей.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @property
+    def cache(self):
+        return caches['pages']
+
+    def __call__(self, request):
+        if not self.cacheable(request):
+            return self.get_response(request)
+        request.page_cache_holes = True
+        key = self.key(request)
+        if not self.may_store(request):
+            # Этот запрос страницу не сохранит: блокировка ключа только
+            # задержала бы тех, кто сохранит.
+            page = self.cache.peek(key)
+            if page is not None and not page.get('unstorable'):
+                return self.respond(request, page)
+            return self.render(request)
+        page = self.cache.get(key)
+        if page is not None:
+            if page.get('unstorable'):
+                return self.render(request)
+            return self.respond(request, page)
+        # Промах: блокировка ключа у этого запроса, остальные запросы
+        # страницы ждут, пока она отрисуется здесь.
+        conditions = {
+            header: request.META.pop(header)
+            for header in CONDITIONAL_HEADERS if header in request.META
+        }
+        stored = False
+        try:
+            response = self.get_response(request)
+            self.cache.set(key, self.page(request, response),
+                           PAGE_CACHE_TIMEOUT)
+            stored = True
+        finally:
+            request.META.update(conditions)
+            if not stored:
+                self.cache.release(key)
+        return self.conditional(request, self.strip(response))
+
+    def render(self, request):
+        return self.strip(self.get_response(request))
+
+    def strip(self, response):
+        if not response.streaming:
+            response.content = holes.strip(response.content)
+        return response
+
+    def page(self, request, response):
+        # Ответ не для кэша (перенаправление на вход, 404, cookie)
+        # тоже запоминается, чтобы следующие запросы не ждали блокировку.
+        if response.streaming or not self.storable(request, response):
+            return {'unstorable': True}
+        return {
+            'content': holes.punch(response.content),
+            'content_type': response['Content-Type'],
+            # Состояние от conditional(): из него кэш строит те же
+            # валидаторы, что и view.
+            'state': getattr(request, 'page_state', None),
+        }
+
+    def cacheable(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        if match.namespace not in PAGE_CACHE_NAMESPACES:
+            return False
+        # Шапке нужен адрес текущей страницы, даже если view не вызовется.
+        request.resolver_match = match
+        return True
+
+    def key(self, request):
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f'page:{page_version()}:{path}'
+
+    def may_store(self, request):
+        return request.method == 'GET' and not request.user.is_authenticated
+
+    def storable(self, request, response):
+        return (
+            response.status_code == 200
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+        )
+
+    def respond(self, request, page):
+        response = HttpResponse(
+            holes.fill(request, page['content']),
+            content_type=page['content_type']
+        )
+        patch_vary_headers(response, ('Cookie',))
+        state = page.get('state')
+        if state is not None and request.user.is_authenticated:
+            # Состояние сохранено для гостя, а у пользователя в нем
+            # свои данные (подписка на автора).
+            match = request.resolver_match
+            state = match.func.page_state(request, **match.kwargs)
+        etag = page_etag(request, state)
+        if etag:
+            response['ETag'] = quote_etag(etag)
+        if state is not None:
+            response['Last-Modified'] = http_date(
+                timegm(state[0].utctimetuple())
+            )
+        return self.conditional(request, response)
+
+    def conditional(self, request, response):
+        if response.status_code != 200:
+            return response
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response
+        )
@@ -0,0 +1,92 @@
+from django.db import migrations
+
+
+# Посты и комментарии лежат в одном индексе: rowid = id * 2 для поста и
+# id * 2 + 1 для комментария. Индекс без копии текста (content=''),
+# поэтому при удалении триггер передает старый текст. unicode61 не
+# считает "ё" буквой "е" с диакритикой, заменяем ее сами.
+def indexed(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+TRIGGERS = []
+for table, parity in (('posts_post', 0), ('posts_comment', 1)):
+    rowid = f'id * 2 + {parity}'
+    TRIGGERS += [
+        f"""
+        CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO posts_search (rowid, text)
+            VALUES (new.{rowid}, {indexed('new.text')});
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO posts_search (posts_search, rowid, text)
+            VALUES ('delete', old.{rowid}, {indexed('old.text')});
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_search_update AFTER UPDATE OF text ON {table}
+        BEGIN
+            INSERT INTO posts_search (posts_search, rowid, text)
+            VALUES ('delete', old.{rowid}, {indexed('old.text')});
+            INSERT INTO posts_search (rowid, text)
+            VALUES (new.{rowid}, {indexed('new.text')});
+        END
+        """,
+    ]
+
+DROP_TRIGGERS = {
+    table: [
+        f'DROP TRIGGER IF EXISTS {table}_search_{action}'
+        for action in ('insert', 'delete', 'update')
+    ]
+    for table in ('posts_post', 'posts_comment')
+}
+
+
+def rebuilding_posts(*operations):
+    """Окружает операции, после которых SQLite пересоздает posts_post
+    (AddField, AlterField), пересозданием триггеров поиска на ней -
+    при миграции и при откате."""
+    triggers = DROP_TRIGGERS['posts_post'] + [
+        sql for sql in TRIGGERS if 'TRIGGER posts_post_' in sql
+    ]
+    return [
+        migrations.RunSQL(migrations.RunSQL.noop, triggers),
+        *operations,
+        migrations.RunSQL(triggers, migrations.RunSQL.noop),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE VIRTUAL TABLE posts_search USING fts5(
+                text,
+                content='',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            """,
+            'DROP TABLE posts_search'
+        ),
+        migrations.RunSQL(
+            TRIGGERS,
+            DROP_TRIGGERS['posts_post'] + DROP_TRIGGERS['posts_comment']
+        ),
+        migrations.RunSQL(
+            [
+                'INSERT INTO posts_search (rowid, text) '
+                f'SELECT id * 2, {indexed("text")} FROM posts_post',
+                'INSERT INTO posts_search (rowid, text) '
+                f'SELECT id * 2 + 1, {indexed("text")} FROM posts_comment',
+            ],
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:03
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search = import_module('posts.migrations.0011_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_image_variants'),
+    ]
+
+    # SQLite добавляет столбцы, пересоздавая таблицу, и триггеры поискового
+    # индекса на posts_post при этом пропадают.
+    operations = search.rebuilding_posts(
+        migrations.AddField(
+            model_name='post',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256 картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Размер картинки, байт'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+    )
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:09
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+search = import_module('posts.migrations.0011_search')
+
+
+def fill_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    names = Post.objects.exclude(image='').order_by().values(
+        'image'
+    ).annotate(refs=Count('pk')).values_list('image', 'refs')
+    MediaFile.objects.bulk_create(
+        (MediaFile(name=name, refs=refs) for name, refs in names.iterator()),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_image_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+            ],
+        ),
+        # AlterField пересоздает posts_post - вместе с триггерами поиска.
+        *search.rebuilding_posts(migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        )),
+        migrations.RunPython(fill_refs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:31
+
+from importlib import import_module
+
+from django.db import migrations, models
+import django.utils.timezone
+
+search = import_module('posts.migrations.0011_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_media_refs'),
+    ]
+
+    operations = [
+        # AddField пересоздает posts_post - вместе с триггерами поиска.
+        *search.rebuilding_posts(migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Изменен'),
+            preserve_default=False,
+        )),
+        migrations.RunSQL(
+            'UPDATE posts_post SET updated_at = pub_date',
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounters',
+            name='timeline_pending',
+            field=models.BooleanField(default=False, verbose_name='Ленты не дозаполнены'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from yatube.settings import FEED_PULL_THRESHOLD
+
+
+def mark_pulled_authors(apps, schema_editor):
+    # Посты авторов выше порога не раздавались по лентам: отметка нужна,
+    # чтобы их разложили, когда автор опустится ниже порога.
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    UserCounters.objects.filter(
+        followers_count__gte=FEED_PULL_THRESHOLD
+    ).update(timeline_pending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_timeline_pending'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_mark_pulled_authors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='timeline_pending',
+            field=models.BooleanField(default=False, verbose_name='Лента не дозаполнена'),
+        ),
+    ]
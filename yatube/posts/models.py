@@ -3,6 +3,8 @@ from django.db import models
 from django.db.models import UniqueConstraint
 from core.models import CreatedModel
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -25,6 +27,12 @@ class Group(models.Model):
         return (self.title)
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Всё, что нужно шаблонам лент, одним запросом."""
+        return self.select_related('author', 'group')
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -48,8 +56,61 @@ class Post(CreatedModel):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Размеры, вес и хэш картинки заполняет сигнал при загрузке. Не через
+    # width_field/height_field: с ними ImageField открывает файл при каждой
+    # загрузке поста, у которого размеры еще не заполнены.
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки',
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки',
+        null=True,
+        editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        verbose_name='Размер картинки, байт',
+        null=True,
+        editable=False
+    )
+    image_hash = models.CharField(
+        verbose_name='SHA-256 картинки',
+        max_length=64,
+        blank=True,
+        editable=False
+    )
+
+    # Меняется и при правке автора или группы: по нему кэшируется
+    # фрагмент поста в лентах.
+    updated_at = models.DateTimeField(
+        verbose_name='Изменен',
+        auto_now=True
+    )
+
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta(CreatedModel.Meta):
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -72,6 +133,14 @@ class Comment(CreatedModel):
         verbose_name='Текст комментария'
     )
 
+    class Meta(CreatedModel.Meta):
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'],
+                name='comment_post_pub_date_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -87,6 +156,12 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+    # Старые посты автора еще не разложены в ленту подписчика: пока
+    # rebuild_timelines их не разложит, автор подмешивается при чтении.
+    timeline_pending = models.BooleanField(
+        verbose_name='Лента не дозаполнена',
+        default=False
+    )
 
     class Meta:
         constraints = [
@@ -95,3 +170,97 @@ class Follow(models.Model):
                 name='unique_following'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters'
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписок',
+        default=0
+    )
+    # Часть постов автора опубликована, пока он был выше
+    # FEED_PULL_THRESHOLD, и не разложена по лентам: пока rebuild_timelines
+    # их не разложит, автор подмешивается при чтении. Отметка не зависит
+    # от того, как счетчик подписчиков опустился ниже порога.
+    timeline_pending = models.BooleanField(
+        verbose_name='Ленты не дозаполнены',
+        default=False
+    )
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='timeline_user_pub_post_idx'
+            ),
+        ]
+
+
+class ImageVariant(models.Model):
+    """Готовая миниатюра картинки поста и ее размер в байтах."""
+    source = models.CharField(max_length=255, db_index=True)
+    name = models.CharField(max_length=255, unique=True)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField(verbose_name='Размер, байт')
+
+
+class MediaFile(models.Model):
+    """Сколько постов ссылается на файл картинки. Файлы без ссылок
+    удаляет вместе с миниатюрами collect_media."""
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField(verbose_name='Ссылок', default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['refs', 'name'],
+                name='mediafile_refs_name_idx'
+            ),
+        ]
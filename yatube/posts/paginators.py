@@ -0,0 +1,130 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(obj):
+    raw = f'{obj.pub_date.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, pk) или None, если токен испорчен."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        stamp, pk = raw.rsplit('|', 1)
+        pub_date = parse_datetime(stamp)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class FeedPaginator(Paginator):
+    """Paginator с окном номеров страниц вокруг текущей.
+
+    ``get_elided_page_range`` повторяет API Django 3.2: первая и последняя
+    страницы, несколько соседних с текущей, пропуски заменены на ELLIPSIS.
+    """
+    ELLIPSIS = '…'
+
+    def get_elided_page_range(self, number=1, *, on_each_side=2, on_ends=1):
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class CursorPage(Page):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = None
+        self.previous_cursor = None
+        if object_list and has_next:
+            self.next_cursor = encode_cursor(object_list[-1])
+        if object_list and has_previous:
+            self.previous_cursor = encode_cursor(object_list[0])
+
+    def __repr__(self):
+        return '<Cursor page of %s objects>' % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+def keyset_window(queryset, cursor, backwards, limit, descending=True,
+                  pk_field='pk'):
+    """Первые ``limit`` строк после курсора в порядке (pub_date, pk).
+
+    При ``backwards`` строки идут в обратном порядке - от курсора к началу.
+    """
+    descending = descending != backwards
+    lookup = 'lt' if descending else 'gt'
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(f'{prefix}pub_date', f'{prefix}{pk_field}')
+    if cursor is not None:
+        pub_date, pk = cursor
+        queryset = queryset.filter(
+            Q(**{f'pub_date__{lookup}': pub_date})
+            | Q(pub_date=pub_date, **{f'{pk_field}__{lookup}': pk})
+        )
+    return list(queryset[:limit])
+
+
+class CursorPaginator:
+    """Keyset-пагинация по (pub_date, pk) без OFFSET и COUNT(*).
+
+    Токены ``after``/``before`` непрозрачны для клиента: это base64 от
+    даты и pk крайнего объекта страницы. Вместо QuerySet можно передать
+    объект с методом ``keyset_window(cursor, backwards, limit)``.
+    """
+
+    def __init__(self, object_list, per_page, descending=True):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.descending = descending
+
+    def _window(self, cursor, backwards, limit):
+        if isinstance(self.object_list, QuerySet):
+            return keyset_window(
+                self.object_list, cursor, backwards, limit, self.descending
+            )
+        return self.object_list.keyset_window(cursor, backwards, limit)
+
+    def get_page(self, after=None, before=None):
+        cursor = decode_cursor(before or after or '')
+        backwards = bool(before) and cursor is not None
+        rows = self._window(cursor, backwards, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=has_more)
+        return CursorPage(
+            rows, self, has_next=has_more, has_previous=cursor is not None
+        )
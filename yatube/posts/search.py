@@ -0,0 +1,99 @@
+import base64
+import binascii
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, Post
+
+# Строки posts_search: rowid = id * 2 у постов и id * 2 + 1 у комментариев.
+POST, COMMENT = 0, 1
+WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксис FTS5: все слова, каждое - префикс."""
+    words = WORD.findall(query.lower().replace('ё', 'е'))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def encode_cursor(rank, rowid):
+    raw = f'{rank!r}|{rowid}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        rank, rowid = base64.urlsafe_b64decode(
+            padded.encode()
+        ).decode().split('|')
+        return float(rank), int(rowid)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def matching_ids(match, kind):
+    """Подзапрос id постов или комментариев, подходящих под match."""
+    return RawSQL(
+        'SELECT rowid / 2 FROM posts_search '
+        'WHERE posts_search MATCH %s AND (rowid & 1) = %s',
+        [match, kind]
+    )
+
+
+class SearchPage:
+    """Страница выдачи: посты и комментарии по убыванию релевантности."""
+
+    def __init__(self, hits, next_cursor):
+        self.object_list = hits
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _ranked_rows(match, cursor, limit):
+    sql = 'SELECT rowid, rank FROM posts_search WHERE posts_search MATCH %s'
+    params = [match]
+    if cursor is not None:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [cursor[0], cursor[0], cursor[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    with connection.cursor() as db:
+        db.execute(sql, params + [limit])
+        return db.fetchall()
+
+
+def search(query, after=None, per_page=10):
+    """Ранжирует совпадения bm25 и листает их по ключу (rank, rowid)."""
+    match = match_expression(query)
+    if not match:
+        return SearchPage([], None)
+    cursor = decode_cursor(after) if after else None
+    rows = _ranked_rows(match, cursor, per_page + 1)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    posts = Post.objects.for_feed().in_bulk(
+        [rowid // 2 for rowid, _ in rows if rowid % 2 == POST]
+    )
+    comments = Comment.objects.select_related('author', 'post').in_bulk(
+        [rowid // 2 for rowid, _ in rows if rowid % 2 == COMMENT]
+    )
+    hits = []
+    for rowid, rank in rows:
+        found = (posts if rowid % 2 == POST else comments).get(rowid // 2)
+        if found is not None:
+            found.search_rank = rank
+            found.search_kind = 'post' if rowid % 2 == POST else 'comment'
+            hits.append(found)
+    return SearchPage(hits, next_cursor)
@@ -0,0 +1,197 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, images, thumbnails, timeline
+from .cache import (
+    bump_feed_version, bump_follow_version, bump_page_version
+)
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+@receiver(pre_save, sender=Post)
+def image_metadata(sender, instance, raw=False, **kwargs):
+    # Новая загрузка еще не записана в хранилище: читаем ее до записи,
+    # чтобы потом не открывать файл ради размеров.
+    if raw:
+        return
+    if not instance.image:
+        images.clear_metadata(instance)
+    elif not instance.image._committed:
+        images.fill_metadata(instance, instance.image.file)
+
+
+@receiver(pre_save, sender=Post)
+def remember_image(sender, instance, raw=False, **kwargs):
+    # Имя прежнего файла нужно, чтобы после сохранения снять с него ссылку.
+    instance.previous_image = ''
+    if not raw and instance.pk:
+        instance.previous_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first() or ''
+
+
+# Счетчики подключены первыми: обработчики лент ниже читают уже
+# обновленное число подписчиков.
+
+
+@receiver(post_save, sender=User)
+def create_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user_counter(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, 'previous_image', '')
+    if raw or previous == instance.image.name:
+        return
+    if instance.image:
+        counters.change_media_refs(instance.image.name, 1)
+    if previous:
+        counters.change_media_refs(previous, -1)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    # Файл без ссылок остается на диске: его с задержкой --min-age
+    # удалит collect_media. Удаление здесь могло бы совпасть с новой
+    # загрузкой той же картинки, которая уже нашла файл в хранилище.
+    if instance.image:
+        counters.change_media_refs(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user_counter(instance.author_id, 'followers_count', 1)
+        counters.change_user_counter(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'followers_count', -1)
+    counters.change_user_counter(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        timeline.push_post(instance)
+    else:
+        timeline.sync_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_timeline(sender, instance, **kwargs):
+    timeline.unfollow(instance.user_id, instance.author_id)
+
+
+# Миниатюры создаются до сброса кэша лент: первая же перерисовка страницы
+# найдет их готовыми.
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # Правка без новой картинки: миниатюры созданы, когда ее загрузили.
+    if not created and instance.previous_image == instance.image.name:
+        return
+    thumbnails.pregenerate(instance.image)
+
+
+# Фрагмент поста в лентах кэшируется по updated_at: правка автора или
+# группы обновляет его у всех их постов.
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def touch_group_posts(sender, instance, created=False, raw=False, **kwargs):
+    # Удаление группы обнуляет ссылку на нее в обход сигналов Post.
+    if not created and not raw:
+        Post.objects.filter(group=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=User)
+def touch_author_posts(sender, instance, created, raw=False,
+                       update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login.
+    if created or raw or update_fields and set(update_fields) <= {
+        'last_login'
+    }:
+        return
+    Post.objects.filter(author=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_feeds_on_user_change(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login - ленты от этого
+    # не меняются.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_feed_version()
+    bump_page_version()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    bump_follow_version(instance.user_id)
+
+
+# Кэшированные страницы показывают еще комментарии и счетчики подписок.
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def invalidate_pages(sender, **kwargs):
+    bump_page_version()
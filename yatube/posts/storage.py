@@ -0,0 +1,41 @@
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from .images import file_digest
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл под именем из SHA-256 содержимого: одинаковые
+    загрузки записываются на диск один раз и делят миниатюры sorl.
+
+    posts/photo.jpg превращается в posts/ab/abcdef....jpg; каталог из
+    upload_to сохраняется, расширение приводится к нижнему регистру.
+    """
+
+    def hashed_name(self, name, content):
+        # SHA-256 новой загрузки уже посчитал pre_save поста.
+        digest = getattr(content, 'sha256', None)
+        if digest is None:
+            _, digest = file_digest(content)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Свежее время изменения защищает файл от сборщика мусора,
+            # пока пост с ним еще не сохранен.
+            os.utime(self.path(name))
+            return name
+        # При гонке двух одинаковых загрузок вторая получит суффикс
+        # от get_available_name: лишняя копия, но не испорченный файл.
+        return super().save(name, content, max_length)
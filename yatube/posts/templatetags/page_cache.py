@@ -0,0 +1,23 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..holes import END, HOLE, HOLES, encode
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **kwargs):
+    """Личный фрагмент страницы: {% hole 'follow_button' username=... %}.
+
+    Отрисовывается как include с аргументами. Если страница попадет
+    в кэш, фрагмент размечается, чтобы следующим посетителям
+    дорисовать свой; аргументы должны сериализоваться в JSON.
+    """
+    fragment = context.template.engine.get_template(HOLES[name][0])
+    with context.push(**kwargs):
+        html = fragment.render(context)
+    request = context.get('request')
+    if not getattr(request, 'page_cache_holes', False):
+        return mark_safe(html)
+    return mark_safe(HOLE.format(encode(name, kwargs)) + html + END)
@@ -0,0 +1,44 @@
+import logging
+from collections import defaultdict
+
+from django import template
+from sorl.thumbnail import get_thumbnail
+
+from ..thumbnails import geometries
+
+logger = logging.getLogger(__name__)
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, sizes='(min-width: 1200px) 960px, 100vw'):
+    """<picture> со всеми ширинами и форматами картинки поста.
+
+    Миниатюры уже созданы при сохранении поста, здесь только поиск
+    в хранилище ключей sorl; ширина и высота берутся оттуда же.
+    """
+    if not image:
+        return {}
+    variants = defaultdict(list)
+    try:
+        for geometry, options in geometries():
+            thumbnail = get_thumbnail(image, geometry, **options)
+            # Без размера sorl отдает миниатюру, которую не смог создать.
+            if thumbnail.size:
+                variants[options['format']].append(thumbnail)
+    except Exception:
+        logger.exception('Нет миниатюр для %s', image.name)
+        return {}
+    fallback = variants.pop('JPEG', None)
+    if not fallback:
+        return {}
+    largest = max(fallback, key=lambda thumbnail: thumbnail.width)
+    return {
+        'sources': [
+            (f'image/{image_format.lower()}', thumbnails)
+            for image_format, thumbnails in variants.items()
+        ],
+        'fallback': fallback,
+        'img': largest,
+        'sizes': sizes,
+    }
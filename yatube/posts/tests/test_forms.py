@@ -1,17 +1,25 @@
 import shutil
 import tempfile
+from io import BytesIO
+from unittest.mock import patch
 
 from http import HTTPStatus
+from django.conf import global_settings, settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Comment, Group, Post
+from ..uploads import BoundedUploadHandler
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+# Теги EXIF
+ORIENTATION = 0x0112
+MAKE = 0x010F
 
 
 class CommentFormTest(TestCase):
@@ -181,3 +189,106 @@ class PostFormsTest(TestCase):
         )
         self.assertRedirects(response, redirect)
         self.assertEqual(Post.objects.count(), post_count)
+
+
+def image_upload(name, image_format, size=(40, 20), exif=None):
+    buffer = BytesIO()
+    options = {'exif': exif.tobytes()} if exif else {}
+    Image.new('RGB', size, 'red').save(buffer, image_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def limit(self, name, value):
+        patcher = patch(f'posts.uploads.{name}', value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image}
+        )
+
+    def assert_rejected(self, image, code):
+        response = self.create(image)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            response.context['form'].errors.as_data()['image'][0].code, code
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_too_large_file_rejected(self):
+        """Проверяем что файл больше лимита не принимается."""
+        self.limit('POST_IMAGE_MAX_BYTES', 100)
+        self.assert_rejected(
+            image_upload('big.png', 'PNG', size=(200, 200)), 'too_large'
+        )
+
+    def test_too_many_pixels_rejected(self):
+        """Проверяем что картинка с лишними пикселями отклоняется
+        до декодирования."""
+        self.limit('POST_IMAGE_MAX_PIXELS', 100)
+        image = image_upload('bomb.png', 'PNG')
+        with patch.object(Image.Image, 'load') as load:
+            self.assert_rejected(image, 'too_many_pixels')
+        load.assert_not_called()
+
+    def test_bounded_handler_scoped_to_post_forms(self):
+        """Проверяем что обработчик загрузок подключен только к формам
+        поста, а CSRF для них по-прежнему проверяется."""
+        handlers = []
+
+        def receive(handler, raw_data, start):
+            handlers.append(type(handler).__name__)
+            return raw_data
+        with patch.object(
+            BoundedUploadHandler, 'receive_data_chunk', receive
+        ):
+            self.create(image_upload('photo.png', 'PNG'))
+        self.assertEqual(handlers, ['BoundedUploadHandler'])
+        self.assertEqual(
+            settings.FILE_UPLOAD_HANDLERS,
+            global_settings.FILE_UPLOAD_HANDLERS
+        )
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(
+            reverse('posts:post_create'), data={'text': 'Без токена'}
+        )
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.filter(text='Без токена').exists())
+
+    def test_exif_stripped_and_applied(self):
+        """Проверяем что картинка повернута по EXIF и сохранена без него."""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        exif[MAKE] = 'Камера'
+        self.create(image_upload('photo.jpg', 'JPEG', exif=exif))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as saved:
+            self.assertEqual(saved.format, 'JPEG')
+            self.assertEqual(saved.size, (20, 40))
+            self.assertEqual(dict(saved.getexif()), {})
+        self.assertEqual((post.image_width, post.image_height), (20, 40))
+
+    def test_long_side_reduced(self):
+        """Проверяем что длинная сторона ужимается до лимита."""
+        self.limit('POST_IMAGE_MAX_SIDE', 10)
+        self.create(image_upload('wide.png', 'PNG'))
+        with Image.open(Post.objects.get().image.path) as saved:
+            self.assertEqual(saved.size, (10, 5))
@@ -0,0 +1,213 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from sorl.thumbnail import default
+
+from .. import media
+from ..models import ImageVariant, MediaFile, Post
+from .test_thumbnails import CREATE_THUMBNAIL, uploaded
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SLEEP = 'posts.management.commands.collect_media.time.sleep'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, image):
+        return Post.objects.create(text='Пост', author=self.user, image=image)
+
+    def refs(self, name):
+        return MediaFile.objects.get(name=name).refs
+
+    def test_duplicates_share_file_and_thumbnails(self):
+        """Проверяем что одинаковая картинка хранится один раз
+        и не создает миниатюры повторно."""
+        first = self.create(uploaded('first.gif', b'dup'))
+        with patch(CREATE_THUMBNAIL) as create:
+            second = self.create(uploaded('SECOND.GIF', b'dup'))
+        create.assert_not_called()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.endswith('.gif'))
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_name_from_stored_hash(self):
+        """Проверяем что имя файла берется из хэша, посчитанного для
+        поста, без повторного чтения загрузки."""
+        with patch('posts.storage.file_digest') as digest:
+            post = self.create(uploaded('hash.gif', b'hash'))
+        digest.assert_not_called()
+        self.assertIn(post.image_hash, post.image.name)
+
+    def test_unreferenced_file_left_to_collector(self):
+        """Проверяем что файл без ссылок остается на диске до сборщика
+        мусора, а тот удаляет его вместе с миниатюрами."""
+        first = self.create(uploaded('a.gif', b'del'))
+        second = self.create(uploaded('b.gif', b'del'))
+        name = first.image.name
+        path = first.image.path
+        thumbnails = [
+            default.storage.path(variant)
+            for variant in ImageVariant.objects.filter(
+                source=name
+            ).values_list('name', flat=True)
+        ]
+        self.assertTrue(thumbnails)
+        first.delete()
+        self.assertEqual(self.refs(name), 1)
+        second.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.refs(name), 0)
+        with patch.object(media, 'walk', wraps=media.walk) as walk:
+            call_command('collect_media', min_age=0, stdout=StringIO())
+        # Каталог картинок не обходится, только миниатюры sorl.
+        walked = [call[0][1] for call in walk.call_args_list]
+        self.assertNotIn('posts/', walked)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(any(map(os.path.exists, thumbnails)))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+        self.assertFalse(ImageVariant.objects.filter(source=name).exists())
+
+    def test_reupload_keeps_released_file(self):
+        """Проверяем что повторная загрузка файла без ссылок освежает его
+        и сборщик мусора файл не трогает."""
+        post = self.create(uploaded('old.gif', b'old'))
+        name = post.image.name
+        post.image = uploaded('new.gif', b'new')
+        post.save()
+        self.assertEqual(self.refs(name), 0)
+        self.assertEqual(self.refs(post.image.name), 1)
+        post.text = 'Правка без картинки'
+        post.save()
+        self.assertEqual(self.refs(post.image.name), 1)
+        path = media.storage().path(name)
+        old = time.time() - 2 * 60 * 60
+        os.utime(path, (old, old))
+        # Загрузка записана, а пост с ней еще не сохранен.
+        again = uploaded('again.gif', b'old')
+        self.assertEqual(media.storage().save('posts/again.gif', again), name)
+        call_command('collect_media', stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+
+    def test_recount_restores_refs(self):
+        """Проверяем что recount считает ссылки постов без сигналов."""
+        Post.objects.bulk_create(
+            Post(text='Пост', author=self.user, image=uploaded(name, b'bulk'))
+            for name in ('c.gif', 'd.gif')
+        )
+        MediaFile.objects.create(name='posts/gone.gif', refs=3)
+        call_command('recount', stdout=StringIO())
+        name = Post.objects.filter(text='Пост').first().image.name
+        self.assertEqual(self.refs(name), 2)
+        self.assertEqual(self.refs('posts/gone.gif'), 0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CollectMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.kept = Post.objects.create(
+            text='Пост', author=self.user, image=uploaded('kept.gif', b'gc1')
+        )
+        orphaned = Post.objects.create(
+            text='Пост', author=self.user, image=uploaded('gone.gif', b'gc2')
+        )
+        self.orphan = orphaned.image.path
+        self.orphan_thumbnails = [
+            default.storage.path(name)
+            for name in ImageVariant.objects.filter(
+                source=orphaned.image.name
+            ).values_list('name', flat=True)
+        ]
+        # Ссылка пропадает мимо сигналов, как после сбоя.
+        Post.objects.filter(pk=orphaned.pk).update(image='')
+        self.stale = default.storage.path(
+            default.storage.save('cache/zz/stale.jpg', ContentFile(b'x'))
+        )
+
+    def collect(self, **options):
+        out = StringIO()
+        call_command('collect_media', stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_keeps_files(self):
+        """Проверяем что пробный запуск только перечисляет файлы."""
+        output = self.collect(dry_run=True, min_age=0, scan=True)
+        self.assertIn('картинок: 1, лишних миниатюр: 1', output)
+        self.assertEqual(output.count(os.path.basename(self.orphan)), 1)
+        self.assertTrue(os.path.exists(self.orphan))
+        self.assertTrue(os.path.exists(self.stale))
+
+    def test_orphans_removed(self):
+        """Проверяем что удаляются только файлы без ссылок из постов."""
+        self.collect(min_age=0, scan=True)
+        self.assertFalse(os.path.exists(self.orphan))
+        self.assertFalse(any(map(os.path.exists, self.orphan_thumbnails)))
+        self.assertFalse(os.path.exists(self.stale))
+        self.assertTrue(os.path.exists(self.kept.image.path))
+        self.assertTrue(ImageVariant.objects.filter(
+            source=self.kept.image.name
+        ).exists())
+
+    def test_untracked_orphan_needs_scan(self):
+        """Проверяем что без --scan файл, о котором не знают счетчики,
+        остается, а ссылка из поста защищает файл с нулевым счетчиком."""
+        MediaFile.objects.filter(name=self.kept.image.name).update(refs=0)
+        self.collect(min_age=0)
+        self.assertTrue(os.path.exists(self.orphan))
+        self.assertTrue(os.path.exists(self.kept.image.path))
+
+    def test_variants_of_missing_source_removed(self):
+        """Проверяем что записи миниатюр исходника, пропавшего с диска,
+        удаляются один раз."""
+        os.remove(self.orphan)
+        self.assertIn('картинок: 1,', self.collect(min_age=0))
+        self.assertFalse(any(map(os.path.exists, self.orphan_thumbnails)))
+        self.assertEqual(
+            ImageVariant.objects.exclude(source=self.kept.image.name).count(),
+            0
+        )
+
+    def test_fresh_files_kept(self):
+        """Проверяем что недавно записанные файлы не трогаются."""
+        self.collect(scan=True)
+        self.assertTrue(os.path.exists(self.orphan))
+        self.assertTrue(os.path.exists(self.stale))
+
+    def test_rate_limit(self):
+        """Проверяем что удаления растягиваются во времени."""
+        with patch(SLEEP) as sleep:
+            self.collect(min_age=0, rate=0.5, scan=True)
+        sleep.assert_called_once()
+        self.assertGreater(sleep.call_args[0][0], 1)
@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from yatube.settings import POSTS_ON_PAGE
+
+from ..models import Comment, Follow, Group, Post
+from ..urls import urlpatterns
+
+User = get_user_model()
+
+# Предельное число SQL-запросов на один GET авторизованного пользователя.
+# Два из них - загрузка сессии и пользователя; профиль и пост читают
+# еще по запросу на валидаторы условного GET.
+QUERY_BUDGETS = {
+    'index': 4,
+    'group_list': 5,
+    'profile': 6,
+    'post_edit': 5,
+    'post_detail': 5,
+    'post_comments': 4,
+    'post_create': 3,
+    'add_comment': 2,
+    'search': 5,
+    'search_api': 5,
+    'follow_index': 6,
+    'profile_follow': 9,
+    'profile_unfollow': 9,
+}
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.author = User.objects.create(username='Author')
+        cls.stranger = User.objects.create(username='Stranger')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Описание тестовой группы'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.user,
+            group=cls.group
+        )
+        cls.url_kwargs = {
+            'group_list': {'slug': cls.group.slug},
+            'profile': {'username': cls.author.username},
+            'post_edit': {'post_id': cls.post.pk},
+            'post_detail': {'post_id': cls.post.pk},
+            'post_comments': {'post_id': cls.post.pk},
+            'add_comment': {'post_id': cls.post.pk},
+            'profile_follow': {'username': cls.stranger.username},
+            'profile_unfollow': {'username': cls.stranger.username},
+        }
+        # Поиск без запроса ничего не ищет: берем слово из постов фикстуры.
+        cls.url_params = {
+            'search': {'q': 'пост'},
+            'search_api': {'q': 'пост'},
+        }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def fill_pages(self):
+        for author in (self.user, self.author):
+            for i in range(POSTS_ON_PAGE):
+                Post.objects.create(
+                    text=f'Пост {i}',
+                    author=author,
+                    group=self.group
+                )
+        Comment.objects.bulk_create(
+            Comment(text=f'Комментарий {i}', post=self.post, author=author)
+            for i in range(POSTS_ON_PAGE)
+            for author in (self.user, self.author)
+        )
+
+    def assert_budgets(self):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                cache.clear()
+                url = reverse(
+                    f'posts:{name}', kwargs=self.url_kwargs.get(name)
+                )
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url, self.url_params.get(name))
+                self.assertLessEqual(
+                    len(queries), budget, '\n'.join(
+                        query['sql'] for query in queries.captured_queries
+                    )
+                )
+
+    def test_every_view_has_budget(self):
+        """Проверяем что для каждого адреса posts задан бюджет запросов."""
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_search_params_find_posts(self):
+        """Проверяем что бюджеты поиска меряются на непустой выдаче."""
+        response = self.client.get(
+            reverse('posts:search_api'), self.url_params['search_api']
+        )
+        self.assertTrue(response.json()['results'])
+
+    def test_budgets_do_not_depend_on_page_size(self):
+        """Проверяем число запросов на почти пустых и полных страницах."""
+        self.assert_budgets()
+        self.fill_pages()
+        self.assert_budgets()
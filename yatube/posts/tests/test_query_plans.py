@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.query_plans import QueryPlanMixin
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import encode_cursor
+
+User = get_user_model()
+
+# Основные таблицы каждого адреса: их запросы должны идти по индексам.
+MAIN_TABLES = {
+    'index': ['posts_post'],
+    'group_list': ['posts_post'],
+    'profile': ['posts_post'],
+    'post_detail': ['posts_post', 'posts_comment'],
+    'post_comments': ['posts_comment'],
+    'follow_index': ['posts_timelineentry', 'posts_post'],
+    'profile_follow': ['posts_follow'],
+    'profile_unfollow': ['posts_follow'],
+}
+
+
+class QueryPlanTest(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.author = User.objects.create(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Описание тестовой группы'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group
+        )
+        Comment.objects.create(
+            text='Комментарий', post=cls.post, author=cls.user
+        )
+        cls.url_kwargs = {
+            'group_list': {'slug': cls.group.slug},
+            'profile': {'username': cls.author.username},
+            'post_detail': {'post_id': cls.post.pk},
+            'post_comments': {'post_id': cls.post.pk},
+            'profile_follow': {'username': cls.author.username},
+            'profile_unfollow': {'username': cls.author.username},
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_views_use_indexes(self):
+        """Проверяем что запросы лент не сканируют таблицы и не сортируют."""
+        for name, tables in MAIN_TABLES.items():
+            url = reverse(f'posts:{name}', kwargs=self.url_kwargs.get(name))
+            with self.subTest(name=name):
+                self.assertQueryPlansUseIndexes(
+                    lambda: self.client.get(url), tables
+                )
+
+    def test_cursor_pages_use_indexes(self):
+        """Проверяем планы курсорных страниц лент в обе стороны."""
+        cursor = encode_cursor(self.post)
+        names = (
+            'index', 'group_list', 'profile', 'follow_index', 'post_comments'
+        )
+        for name in names:
+            url = reverse(f'posts:{name}', kwargs=self.url_kwargs.get(name))
+            for query in (f'?after={cursor}', f'?before={cursor}'):
+                with self.subTest(name=name, query=query):
+                    self.assertQueryPlansUseIndexes(
+                        lambda: self.client.get(url + query),
+                        MAIN_TABLES[name]
+                    )
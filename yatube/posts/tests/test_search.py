@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..search import search
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.post = Post.objects.create(
+            text='Ёжик в тумане', author=cls.user
+        )
+        cls.loud_post = Post.objects.create(
+            text='Ежик, ежик и еще раз ежик', author=cls.user
+        )
+        cls.comment = Comment.objects.create(
+            text='Какой милый ежик', post=cls.post, author=cls.user
+        )
+        Post.objects.create(text='Лошадка', author=cls.user)
+
+    def test_posts_and_comments_ranked(self):
+        """Проверяем поиск по постам и комментариям с ранжированием."""
+        hits = list(search('ЕЖИК'))
+        self.assertEqual(hits[0], self.loud_post)
+        self.assertCountEqual(
+            [(hit.search_kind, hit.pk) for hit in hits],
+            [
+                ('post', self.post.pk),
+                ('post', self.loud_post.pk),
+                ('comment', self.comment.pk),
+            ]
+        )
+        self.assertEqual(list(search('туман')), [self.post])
+        self.assertFalse(list(search('"*')))
+
+    def test_triggers_survive_migrations(self):
+        """Проверяем что после миграций, пересоздающих таблицы, триггеры
+        поискового индекса на месте."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            )
+            triggers = {name for name, in cursor.fetchall()}
+        self.assertLessEqual({
+            f'{table}_search_{action}'
+            for table in ('posts_post', 'posts_comment')
+            for action in ('insert', 'delete', 'update')
+        }, triggers)
+
+    def test_index_follows_changes(self):
+        """Проверяем что индекс обновляется при правке и удалении."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Лисичка'
+        post.save()
+        self.assertEqual(list(search('туман')), [])
+        self.assertEqual(list(search('лисичка')), [post])
+        Post.objects.bulk_create([
+            Post(text='Лисичка-сестричка', author=self.user)
+        ])
+        self.assertEqual(len(search('лисичка')), 2)
+        post.delete()
+        self.assertEqual(
+            [hit.search_kind for hit in search('ежик')], ['post']
+        )
+
+    def test_keyset_pages(self):
+        """Проверяем что страницы выдачи не теряют и не повторяют строки."""
+        everything = list(search('ежик'))
+        first = search('ежик', per_page=2)
+        second = search('ежик', after=first.next_cursor, per_page=2)
+        self.assertEqual(list(first) + list(second), everything)
+        self.assertFalse(second.has_next())
+
+    def test_search_view_and_api(self):
+        """Проверяем страницу поиска и JSON API."""
+        client = Client()
+        response = client.get(reverse('posts:search'), {'q': 'туман'})
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        response = client.get(reverse('posts:search_api'), {'q': 'милый'})
+        self.assertEqual(response.json()['results'], [{
+            'type': 'comment',
+            'id': self.comment.pk,
+            'post_id': self.post.pk,
+            'text': self.comment.text,
+            'author': self.user.username,
+            'pub_date': self.comment.pub_date.isoformat(),
+            'rank': response.json()['results'][0]['rank'],
+        }])
+        self.assertIsNone(response.json()['next'])
+
+    def test_admin_search(self):
+        """Проверяем что поиск в админке идет по полнотекстовому индексу."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'туман'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post]
+        )
+        response = client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'милый'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.comment]
+        )
@@ -0,0 +1,262 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from ..kvstore import KVStore
+from ..models import ImageVariant, Post
+from ..thumbnails import SORL_PRIVATE_API, geometries, pregenerate
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+CREATE_THUMBNAIL = 'sorl.thumbnail.base.ThumbnailBackend._create_thumbnail'
+
+
+def uploaded(name, tail=b''):
+    # Хранилище раскладывает файлы по хэшу: разный хвост после конца
+    # GIF дает разные файлы.
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF + tail, content_type='image/gif'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.guest_client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['thumbnails'].clear()
+        default.kvstore.clear_local()
+
+    def assert_pages_only_lookup(self, post):
+        cache.clear()
+        with patch(CREATE_THUMBNAIL) as create:
+            for url in (
+                reverse('posts:index'),
+                reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            ):
+                self.guest_client.get(url)
+        create.assert_not_called()
+
+    def test_thumbnails_created_on_save(self):
+        """Проверяем что миниатюры готовы до первого просмотра страницы."""
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=uploaded('a.gif')
+        )
+        self.assert_pages_only_lookup(post)
+
+    def test_text_edit_skips_thumbnails(self):
+        """Проверяем что правка текста не перебирает миниатюры, а новая
+        картинка получает их сразу."""
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=uploaded('e.gif')
+        )
+        with patch('posts.thumbnails.pregenerate') as pregenerate:
+            post.text = 'Новый текст'
+            post.save()
+            pregenerate.assert_not_called()
+            post.image = uploaded('f.gif', b'edit')
+            post.save()
+            pregenerate.assert_called_once_with(post.image)
+
+    def test_command_fills_missing_thumbnails(self):
+        """Проверяем что команда создает миниатюры для старых картинок."""
+        Post.objects.bulk_create([
+            Post(text='Старый пост', author=self.user, image=uploaded('b.gif'))
+        ])
+        call_command('pregenerate_thumbnails', stdout=StringIO())
+        self.assert_pages_only_lookup(Post.objects.get(text='Старый пост'))
+
+    def test_pool_resumes_from_checkpoint(self):
+        """Проверяем что процессы продолжают работу с сохраненного поста."""
+        Post.objects.bulk_create(
+            Post(text='Пост', author=self.user, image=image)
+            for image in (uploaded('a.gif', bytes([i])) for i in range(3))
+        )
+        first, *rest = Post.objects.order_by('pk')
+        checkpoint = f'{TEMP_MEDIA_ROOT}/checkpoint'
+        with open(checkpoint, 'w') as file:
+            file.write(str(first.pk))
+        call_command(
+            'pregenerate_thumbnails',
+            workers=2,
+            batch_size=1,
+            checkpoint=checkpoint,
+            stdout=StringIO()
+        )
+        self.assertIsNone(default.kvstore.get(ImageFile(first.image)))
+        cache.clear()
+        with patch(CREATE_THUMBNAIL) as create:
+            for post in rest:
+                self.assertTrue(pregenerate(post.image))
+        create.assert_not_called()
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_warm_lookups_skip_database(self):
+        """Проверяем что прогретые миниатюры не читаются из базы."""
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=uploaded('c.gif')
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        default.kvstore.clear_local()
+        caches['thumbnails'].clear()
+        self.guest_client.get(url)
+        self.assertTrue(default.kvstore.stats['misses'])
+        # Страница тоже кэшируется целиком: отрисовываем ее заново.
+        cache.clear()
+        default.kvstore.clear_local()
+        self.guest_client.get(url)
+        self.assertTrue(default.kvstore.stats['cache_hits'])
+        self.assertFalse(default.kvstore.stats['misses'])
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ])
+        self.assertTrue(default.kvstore.stats['local_hits'])
+
+    def test_responsive_variants(self):
+        """Проверяем srcset, размеры картинки и учет байтов миниатюр."""
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=uploaded('d.gif')
+        )
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        for width in (320, 640, 960):
+            self.assertContains(response, f'.jpg {width}w')
+        self.assertContains(response, 'width="960"')
+        self.assertContains(response, 'height="339"')
+        variants = ImageVariant.objects.filter(source=post.image.name)
+        self.assertEqual(variants.count(), len(geometries()))
+        self.assertFalse(variants.filter(size=0))
+        out = StringIO()
+        call_command('image_savings', stdout=out)
+        self.assertIn('% от JPEG', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def assert_metadata(self, post):
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_size),
+            (2, 1, len(SMALL_GIF))
+        )
+        self.assertEqual(
+            post.image_hash, hashlib.sha256(SMALL_GIF).hexdigest()
+        )
+
+    def test_metadata_filled_on_upload(self):
+        """Проверяем что размеры, вес и хэш сохраняются при загрузке."""
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=uploaded('e.gif')
+        )
+        self.assert_metadata(Post.objects.get(pk=post.pk))
+        post.image = None
+        post.save()
+        self.assertIsNone(Post.objects.get(pk=post.pk).image_width)
+
+    def test_backfill_command(self):
+        """Проверяем что команда заполняет данные старых картинок."""
+        Post.objects.bulk_create([
+            Post(text='Старый пост', author=self.user, image=uploaded('f.gif'))
+        ])
+        call_command('backfill_image_metadata', stdout=StringIO())
+        self.assert_metadata(Post.objects.get(text='Старый пост'))
+
+    def test_feed_opens_no_files(self):
+        """Проверяем что лента с картинками не открывает файлы."""
+        for i in range(3):
+            Post.objects.create(
+                text='Пост', author=self.user, image=uploaded(f'g{i}.gif')
+            )
+        cache.clear()
+        storage_open = 'django.core.files.storage.FileSystemStorage.open'
+        with patch(storage_open) as opened:
+            response = Client().get(reverse('posts:index'))
+        opened.assert_not_called()
+        self.assertContains(response, 'height="339"', count=3)
+
+
+class SorlPrivateApiTest(SimpleTestCase):
+    def test_private_methods_present(self):
+        """Проверяем что в установленной версии sorl есть внутренние
+        методы, которые вызывают render и store."""
+        for name, attributes in SORL_PRIVATE_API.items():
+            component = getattr(default, name)
+            for attribute in attributes:
+                with self.subTest(component=name, attribute=attribute):
+                    self.assertTrue(hasattr(component, attribute))
+
+
+class KVStoreThreadsTest(SimpleTestCase):
+    def test_eviction_between_lookup_and_touch(self):
+        """Проверяем что другой поток не вытесняет ключ между чтением
+        из словаря процесса и переносом его в конец очереди."""
+        kvstore = KVStore()
+        threads = []
+
+        class EvictingDict(OrderedDict):
+            def get(self, key, default=None):
+                entry = super().get(key, default)
+                thread = threading.Thread(
+                    target=kvstore._remember, args=('other', 'value')
+                )
+                thread.start()
+                thread.join(0.1)
+                threads.append(thread)
+                return entry
+
+        with patch('posts.kvstore.THUMBNAIL_LOCAL_SIZE', 1):
+            kvstore._remember('key', 'value')
+            kvstore.local = EvictingDict(kvstore.local)
+            self.assertEqual(kvstore._get_raw('key'), 'value')
+            for thread in threads:
+                thread.join()
+        self.assertEqual(list(kvstore.local), ['other'])
@@ -0,0 +1,201 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from yatube.settings import POSTS_ON_PAGE
+
+from ..counters import recount_users
+from ..feeds import HybridFeed
+from ..models import Follow, Post, TimelineEntry, UserCounters
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='Reader')
+        cls.author = User.objects.create(username='Author')
+        cls.other = User.objects.create(username='Other')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """Проверяем что при подписке в ленту попадают старые посты."""
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_follow_prolific_author_deferred(self):
+        """Проверяем что подписка на автора с постами дальше страниц
+        с номерами не раскладывает их в запросе, а лента уже полная."""
+        with patch('posts.timeline.FEED_MAX_OFFSET', 0):
+            self.client.get(reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.author.username}
+            ))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed(), [self.old_post])
+        call_command('rebuild_timelines', pending=True, stdout=StringIO())
+        self.assertEqual(HybridFeed(self.reader).pulled, [])
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_new_post_fans_out(self):
+        """Проверяем что новый пост раздается подписчикам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.other)
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_and_delete_prune_timeline(self):
+        """Проверяем что отписка и удаление поста чистят ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(text='Новый пост', author=self.author)
+        new_post.delete()
+        self.assertEqual(self.feed(), [self.old_post])
+        self.client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+
+    def test_rebuild_command(self):
+        """Проверяем что команда восстанавливает ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        TimelineEntry.objects.create(
+            user=self.other,
+            post=self.old_post,
+            author=self.author,
+            pub_date=self.old_post.pub_date
+        )
+        call_command('rebuild_timelines', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.other))
+
+
+class HybridFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='Reader')
+        cls.fan = User.objects.create(username='Fan')
+        cls.star = User.objects.create(username='Star')
+        cls.author = User.objects.create(username='Author')
+
+    def setUp(self):
+        threshold = patch('posts.timeline.FEED_PULL_THRESHOLD', 2)
+        threshold.start()
+        self.addCleanup(threshold.stop)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.fan, author=self.star)
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {i}',
+                author=self.star if i % 3 else self.author
+            )
+            for i in range(POSTS_ON_PAGE + 5)
+        ]
+        self.posts.reverse()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_star_posts_are_pulled(self):
+        """Проверяем что посты популярного автора не раздаются."""
+        self.assertFalse(TimelineEntry.objects.filter(author=self.star))
+        self.assertEqual(HybridFeed(self.reader).count(), len(self.posts))
+
+    def test_offset_pages_merged(self):
+        """Проверяем слияние потоков на страницах с номерами."""
+        url = reverse('posts:follow_index')
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(url + '?page=2').context['page_obj']
+        self.assertEqual(list(first) + list(second), self.posts)
+
+    def test_offset_pages_capped(self):
+        """Проверяем что страницы с номерами не читают потоки дальше
+        FEED_MAX_OFFSET."""
+        url = reverse('posts:follow_index')
+        with patch('posts.feeds.FEED_MAX_OFFSET', POSTS_ON_PAGE):
+            with patch.object(
+                HybridFeed, 'keyset_window', autospec=True,
+                side_effect=HybridFeed.keyset_window
+            ) as window:
+                page = self.client.get(url + '?page=2').context['page_obj']
+        self.assertEqual(page.paginator.num_pages, 1)
+        self.assertEqual(list(page), self.posts[:POSTS_ON_PAGE])
+        self.assertEqual(window.call_args[0][3], POSTS_ON_PAGE)
+
+    def test_cursor_pages_merged(self):
+        """Проверяем слияние потоков на курсорных страницах."""
+        url = reverse('posts:follow_index')
+        first = self.client.get(url + '?after=').context['page_obj']
+        second = self.client.get(
+            url + f'?after={first.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(first) + list(second), self.posts)
+        back = self.client.get(
+            url + f'?before={second.previous_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_unfollow_below_threshold_deferred(self):
+        """Проверяем что автор ниже порога подмешивается при чтении,
+        пока rebuild_timelines не разложит его посты по лентам."""
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader, author=self.star
+        ))
+        self.assertEqual(
+            list(HybridFeed(self.reader).keyset_window(None, False, 100)),
+            self.posts
+        )
+        call_command('rebuild_timelines', pending=True, stdout=StringIO())
+        self.assertEqual(HybridFeed(self.reader).pulled, [])
+        self.assertEqual(
+            list(HybridFeed(self.reader).keyset_window(None, False, 100)),
+            self.posts
+        )
+
+    def test_recount_below_threshold_deferred(self):
+        """Проверяем что автор, опустившийся ниже порога при пересчете
+        счетчиков, тоже подмешивается до rebuild_timelines."""
+        UserCounters.objects.filter(user=self.star).update(followers_count=5)
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        recount_users([self.star.pk])
+        self.assertEqual(
+            list(HybridFeed(self.reader).keyset_window(None, False, 100)),
+            self.posts
+        )
+        call_command('rebuild_timelines', pending=True, stdout=StringIO())
+        self.assertEqual(HybridFeed(self.reader).pulled, [])
+        self.assertEqual(
+            list(HybridFeed(self.reader).keyset_window(None, False, 100)),
+            self.posts
+        )
+
+    def test_pending_kept_above_threshold(self):
+        """Проверяем что автор выше порога не раскладывается по лентам."""
+        call_command('rebuild_timelines', pending=True, stdout=StringIO())
+        self.assertFalse(TimelineEntry.objects.filter(author=self.star))
+        self.assertTrue(
+            UserCounters.objects.get(user=self.star).timeline_pending
+        )
@@ -1,16 +1,24 @@
 import shutil
 import tempfile
+from http import HTTPStatus
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
-from yatube.settings import POSTS_ON_PAGE
+from core.cache import StampedeCache
+from yatube.settings import COMMENTS_ON_PAGE, POSTS_ON_PAGE
 
+from ..cache import bump_page_version
+from ..counters import recount_users
 from ..models import Comment, Follow, Group, Post
+from ..paginators import FeedPaginator
 
 User = get_user_model()
 
@@ -96,6 +104,8 @@ class PaginatorViewTest(TestCase):
             )
             post_list.append(new_post)
         Post.objects.bulk_create(post_list)
+        # bulk_create обходит сигналы, счетчик постов пересчитываем сами.
+        recount_users([cls.user.pk])
 
     def test_first_page(self):
         """Тестируем первую страницу пагинатора."""
@@ -126,6 +136,116 @@ class PaginatorViewTest(TestCase):
             self.assertEqual(len(response.context['page_obj']), count)
 
 
+class PageWindowTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.guest_client = Client()
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=cls.user)
+            for i in range(POSTS_ON_PAGE * 30)
+        )
+        recount_users([cls.user.pk])
+
+    def test_elided_page_range(self):
+        """Проверяем окно номеров страниц вокруг текущей."""
+        paginator = FeedPaginator(range(1000), 10)
+        ellipsis = paginator.ELLIPSIS
+        cases = {
+            1: [1, 2, 3, ellipsis, 100],
+            50: [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100],
+            100: [1, ellipsis, 98, 99, 100],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(paginator.get_elided_page_range(number)), expected
+                )
+        short = FeedPaginator(range(30), 10)
+        self.assertEqual(list(short.get_elided_page_range(2)), [1, 2, 3])
+
+    def test_paginator_links_bounded(self):
+        """Проверяем что ссылок на страницы не больше окна."""
+        response = self.guest_client.get(reverse('posts:profile', kwargs={
+            'username': self.user.username
+        }) + '?page=15')
+        content = response.content.decode()
+        for number in (1, 13, 14, 16, 17, 30):
+            self.assertIn(f'href="?page={number}"', content)
+        for number in (2, 12, 18, 29):
+            self.assertNotIn(f'href="?page={number}"', content)
+
+
+class CursorPaginatorViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.group_test = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Описание тестовой группы'
+        )
+        post_list = []
+        for i in range(0, 13):
+            new_post = Post(
+                text=f'Тестовый пост контент {i}',
+                group=cls.group_test,
+                author=cls.user
+            )
+            post_list.append(new_post)
+        Post.objects.bulk_create(post_list)
+        cls.page_list = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group_test.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username})
+        ]
+
+    def test_cursor_pages(self):
+        """Проверяем переходы вперед и назад по курсорам."""
+        count = Post.objects.count() - POSTS_ON_PAGE
+        for page in self.page_list:
+            with self.subTest(page=page):
+                first = self.authorized_client.get(page + '?after=')
+                first_page = first.context['page_obj']
+                self.assertEqual(len(first_page), POSTS_ON_PAGE)
+                self.assertFalse(first_page.has_previous())
+                second = self.authorized_client.get(
+                    page + f'?after={first_page.next_cursor}'
+                )
+                second_page = second.context['page_obj']
+                self.assertEqual(len(second_page), count)
+                self.assertFalse(second_page.has_next())
+                back = self.authorized_client.get(
+                    page + f'?before={second_page.previous_cursor}'
+                )
+                self.assertEqual(
+                    list(back.context['page_obj']), list(first_page)
+                )
+
+    def test_cursor_without_count(self):
+        """Проверяем что курсорная страница не считает COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(
+                reverse('posts:group_list', kwargs={'slug': 'test'})
+                + '?after='
+            )
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+    def test_broken_cursor(self):
+        """Проверяем что испорченный курсор дает первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?before=broken'
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), POSTS_ON_PAGE)
+        self.assertFalse(page_obj.has_previous())
+
+
 class PostViewTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -153,6 +273,9 @@ class PostViewTest(TestCase):
             author=cls.user,
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_pages_correct_templates(self):
         """Проверяем URL с шаблоном."""
         slug = self.group_test.slug
@@ -248,6 +371,18 @@ class PostViewTest(TestCase):
     def test_cache_index(self):
         """Проверяем что главная отдает кэшированные данные."""
         response_1 = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post_test.pk).update(
+            text='Изменено в обход сигналов'
+        )
+        response_2 = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response_1.content, response_2.content)
+        cache.clear()
+        response_3 = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response_1.content, response_3.content)
+
+    def test_cache_index_invalidation(self):
+        """Проверяем что новый пост сразу виден на главной."""
+        response_1 = self.authorized_client.get(reverse('posts:index'))
         count_1 = len(response_1.context['page_obj'])
         Post.objects.create(
             text='Тестовый пост контент 2',
@@ -255,11 +390,21 @@ class PostViewTest(TestCase):
             author=self.user,
         )
         response_2 = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_1.content, response_2.content)
-        cache.clear()
-        response_3 = self.authorized_client.get(reverse('posts:index'))
-        count_3 = len(response_3.context['page_obj'])
-        self.assertEqual(count_3, count_1 + 1)
+        self.assertEqual(len(response_2.context['page_obj']), count_1 + 1)
+        self.assertIn('Тестовый пост контент 2', response_2.content.decode())
+
+    def test_cache_index_vary(self):
+        """Проверяем что кэш главной различает страницы и гостей."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост для пагинации {i}', author=self.user)
+            for i in range(POSTS_ON_PAGE)
+        )
+        first = self.authorized_client.get(reverse('posts:index'))
+        second = self.authorized_client.get(reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+        guest = Client().get(reverse('posts:index'))
+        self.assertNotIn('Избранные авторы', guest.content.decode())
+        self.assertIn('Избранные авторы', first.content.decode())
 
 
 class FollowTest(TestCase):
@@ -372,3 +517,335 @@ class ComentTest(TestCase):
         first_object = response.context['comments'][0]
         self.assertEqual(first_object.text, self.comment_test.text)
         self.assertEqual(first_object.author, self.comment_test.author)
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.guest_client = Client()
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        for i in range(COMMENTS_ON_PAGE + 5):
+            Comment.objects.create(
+                text=f'Комментарий {i}', post=cls.post, author=cls.user
+            )
+        cls.comments = list(Comment.objects.order_by('pub_date', 'pk'))
+
+    def test_first_batch_newest(self):
+        """Проверяем что на странице поста только первая пачка новых."""
+        response = self.guest_client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ))
+        comments = response.context['comments']
+        self.assertEqual(
+            list(comments), self.comments[::-1][:COMMENTS_ON_PAGE]
+        )
+        self.assertContains(response, comments.next_cursor)
+
+    def test_fragment_loads_next_batch(self):
+        """Проверяем что фрагмент отдает следующую пачку комментариев."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        first = self.guest_client.get(url + '?order=old')
+        self.assertTemplateUsed(first, 'posts/includes/comment_list.html')
+        self.assertTemplateNotUsed(first, 'base.html')
+        cursor = first.context['comments'].next_cursor
+        second = self.guest_client.get(url + f'?order=old&after={cursor}')
+        self.assertEqual(
+            list(first.context['comments']) + list(second.context['comments']),
+            self.comments
+        )
+        self.assertFalse(second.context['comments'].has_next())
+        self.assertNotContains(second, 'data-fragment')
+
+
+class PostRowCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Описание тестовой группы'
+        )
+        cls.post = Post.objects.create(
+            text='Исходный текст', author=cls.user, group=cls.group
+        )
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def profile(self):
+        return self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username})
+        )
+
+    def test_row_reused_across_feeds(self):
+        """Проверяем что строка поста из главной используется в профиле."""
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Изменено в обход сигналов'
+        )
+        self.assertContains(self.profile(), 'Исходный текст')
+
+    def test_post_edit_invalidates_row(self):
+        """Проверяем что правка поста меняет его строку в ленте."""
+        self.profile()
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertContains(self.profile(), 'Новый текст')
+
+    def test_author_and_group_edit_invalidate_row(self):
+        """Проверяем что правка автора или группы обновляет updated_at."""
+        self.profile()
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        self.assertContains(self.profile(), 'Лев Толстой')
+        updated_at = Post.objects.get(pk=self.post.pk).updated_at
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertGreater(
+            Post.objects.get(pk=self.post.pk).updated_at, updated_at
+        )
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.author = User.objects.create(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Описание тестовой группы'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': cls.group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': cls.author.username}
+            ),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': cls.post.pk}
+            ),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        shared = patch(
+            'posts.conditional.SHARED_CACHE_LOCATION', 'cache.sqlite3'
+        )
+        shared.start()
+        self.addCleanup(shared.stop)
+
+    def test_unchanged_pages_not_modified(self):
+        """Проверяем что неизменившаяся страница отдает пустой 304
+        без шаблонов."""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertEqual(response.content, b'')
+                self.assertFalse(response.templates)
+
+    def test_changes_update_validators(self):
+        """Проверяем что новый пост, комментарий и подписка меняют ETag."""
+        changes = (
+            ('index', lambda: Post.objects.create(
+                text='Новый пост', author=self.author
+            )),
+            ('post_detail', lambda: Comment.objects.create(
+                text='Комментарий', post=self.post, author=self.user
+            )),
+            ('profile', lambda: Follow.objects.create(
+                user=self.user, author=self.author
+            )),
+        )
+        for name, change in changes:
+            with self.subTest(name=name):
+                etag = self.client.get(self.urls[name])['ETag']
+                change()
+                response = self.client.get(
+                    self.urls[name], HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_feed_etag_follows_version(self):
+        """Проверяем что правка в ту же секунду тоже меняет ETag ленты."""
+        with patch('posts.cache.time.time', return_value=1000000000.0):
+            response = self.client.get(self.urls['index'])
+            Post.objects.create(text='Новый пост', author=self.author)
+            response = self.client.get(
+                self.urls['index'], HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_feeds_without_shared_cache_not_validated(self):
+        """Проверяем что без общего кэша ленты отдаются целиком,
+        а пост по-прежнему отвечает 304."""
+        with patch('posts.conditional.SHARED_CACHE_LOCATION', ''):
+            for name in ('index', 'profile'):
+                with self.subTest(name=name):
+                    response = self.client.get(self.urls[name])
+                    self.assertFalse(response.has_header('Last-Modified'))
+            etag = self.client.get(self.urls['post_detail'])['ETag']
+            response = self.client.get(
+                self.urls['post_detail'], HTTP_IF_NONE_MATCH=etag
+            )
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_depends_on_user(self):
+        """Проверяем что у гостя и пользователя разные ETag."""
+        url = self.urls['index']
+        self.assertNotEqual(
+            Client().get(url)['ETag'], self.client.get(url)['ETag']
+        )
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='NoName')
+        cls.author = User.objects.create(username='Author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.guest_client = Client()
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.profile_url = reverse(
+            'posts:profile', kwargs={'username': cls.author.username}
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_served_from_cache(self):
+        """Проверяем что повторная страница гостю не читает базу."""
+        for url in (self.post_url, reverse('about:tech')):
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    second = self.guest_client.get(url)
+                self.assertFalse(queries.captured_queries)
+                self.assertTemplateNotUsed(second, 'base.html')
+                self.assertEqual(second.content, first.content)
+                self.assertNotContains(second, '<!--hole:')
+
+    def test_holes_filled_for_user(self):
+        """Проверяем что в кэшированной гостем странице пользователь
+        видит свое меню, кнопку подписки, правку и форму комментария."""
+        Follow.objects.create(user=self.user, author=self.author)
+        for url, expected in (
+            (self.profile_url, 'Отписаться'),
+            (self.post_url, 'редактировать запись'),
+            (self.post_url, 'csrfmiddlewaretoken'),
+        ):
+            with self.subTest(url=url, expected=expected):
+                self.assertNotContains(self.guest_client.get(url), expected)
+                response = self.authorized_client.get(url)
+                self.assertTemplateNotUsed(response, 'base.html')
+                self.assertContains(response, expected)
+                self.assertContains(response, 'Выйти')
+                self.assertNotContains(response, 'Войти')
+                self.assertNotContains(self.guest_client.get(url), expected)
+
+    def test_authorized_page_not_stored(self):
+        """Проверяем что страница пользователя не попадает в кэш."""
+        self.authorized_client.get(self.post_url)
+        response = self.guest_client.get(self.post_url)
+        self.assertTemplateUsed(response, 'base.html')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+
+    def test_model_changes_invalidate_page(self):
+        """Проверяем что комментарий и подписка обновляют страницы."""
+        changes = (
+            (self.post_url, 'Комментарий', lambda: Comment.objects.create(
+                text='Комментарий', post=self.post, author=self.author
+            )),
+            (self.profile_url, 'Подписчиков: 1', lambda: Follow.objects.create(
+                user=self.user, author=self.author
+            )),
+        )
+        for url, expected, change in changes:
+            with self.subTest(url=url):
+                self.assertNotContains(self.guest_client.get(url), expected)
+                change()
+                self.assertContains(self.guest_client.get(url), expected)
+
+    def test_unstorable_requests_skip_lock(self):
+        """Проверяем что пользователь и ответы не для кэша не берут
+        блокировку страницы."""
+        with patch.object(StampedeCache, '_lock', side_effect=AssertionError):
+            self.assertEqual(
+                self.authorized_client.get(self.post_url).status_code,
+                HTTPStatus.OK
+            )
+        url = reverse('posts:post_create')
+        self.guest_client.get(url)
+        with patch.object(StampedeCache, '_lock', side_effect=AssertionError):
+            self.assertEqual(
+                self.guest_client.get(url).status_code, HTTPStatus.FOUND
+            )
+
+    def test_cached_page_not_modified(self):
+        """Проверяем что страница из кэша отвечает 304 по ETag."""
+        self.guest_client.get(self.post_url)
+        response = self.authorized_client.get(self.post_url)
+        response = self.authorized_client.get(
+            self.post_url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_conditional_miss_stores_page(self):
+        """Проверяем что условный запрос гостя на промахе кэша получает
+        304 и все равно сохраняет страницу."""
+        url = reverse('posts:index')
+        with patch('posts.conditional.SHARED_CACHE_LOCATION', 'cache.sqlite3'):
+            etag = self.guest_client.get(url)['ETag']
+            bump_page_version()
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+            response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTemplateNotUsed(response, 'base.html')
+
+    def test_cache_and_view_share_etag(self):
+        """Проверяем что страница из кэша и от view отдают один ETag."""
+        Follow.objects.create(user=self.user, author=self.author)
+        with patch('posts.conditional.SHARED_CACHE_LOCATION', 'cache.sqlite3'):
+            for url in (self.post_url, self.profile_url):
+                for client in (self.guest_client, self.authorized_client):
+                    with self.subTest(url=url, client=client):
+                        cache.clear()
+                        rendered = client.get(url)
+                        self.guest_client.get(url)
+                        cached = client.get(url)
+                        self.assertTemplateNotUsed(cached, 'base.html')
+                        self.assertEqual(cached['ETag'], rendered['ETag'])
+                        self.assertEqual(
+                            cached['Last-Modified'],
+                            rendered['Last-Modified']
+                        )
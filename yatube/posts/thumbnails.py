@@ -0,0 +1,169 @@
+import logging
+import os
+
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.images import ImageFile, serialize_image_file
+from sorl.thumbnail.helpers import serialize
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from yatube.settings import THUMBNAIL_GEOMETRIES
+
+from .models import ImageVariant, Post
+
+logger = logging.getLogger(__name__)
+
+
+def geometries():
+    """THUMBNAIL_GEOMETRIES без форматов, которые Pillow не умеет писать."""
+    webp = features.check('webp')
+    return [
+        (geometry, options) for geometry, options in THUMBNAIL_GEOMETRIES
+        if webp or options.get('format') != 'WEBP'
+    ]
+
+
+def _measure(thumbnail):
+    thumbnail.bytes = thumbnail.storage.size(thumbnail.name)
+    return thumbnail
+
+
+def record_variants(rendered):
+    """Сохраняет размеры миниатюр, чтобы считать экономию трафика."""
+    ImageVariant.objects.bulk_create(
+        (
+            ImageVariant(
+                source=source.name,
+                name=thumbnail.name,
+                format=os.path.splitext(thumbnail.name)[1][1:],
+                width=thumbnail.width,
+                height=thumbnail.height,
+                size=thumbnail.bytes
+            )
+            for source, thumbnails in rendered
+            for thumbnail in thumbnails
+        ),
+        ignore_conflicts=True
+    )
+
+
+def pregenerate(image):
+    """Создает все миниатюры из THUMBNAIL_GEOMETRIES, чтобы шаблонам
+    оставалось только найти их в хранилище ключей sorl.
+
+    Возвращает False, если исходный файл не удалось прочитать.
+    """
+    if not image:
+        return True
+    thumbnails = []
+    for geometry, options in geometries():
+        thumbnail = get_thumbnail(image, geometry, **options)
+        if not thumbnail.exists():
+            # Одинаковые картинки делят миниатюры: ключ мог остаться
+            # от удаленного файла. Забываем его и создаем миниатюру заново.
+            default.kvstore.delete(thumbnail, delete_thumbnails=False)
+            thumbnail = get_thumbnail(image, geometry, **options)
+        if not thumbnail.exists():
+            logger.warning('Не удалось создать миниатюру %s', image.name)
+            return False
+        thumbnails.append(_measure(thumbnail))
+    record_variants([(ImageFile(image), thumbnails)])
+    return True
+
+
+# Внутренние методы sorl, на которых держатся render и store. Их нет
+# в публичном API: версия sorl закреплена в requirements.txt, а тест
+# проверяет, что методы на месте.
+SORL_PRIVATE_API = {
+    'backend': (
+        '_get_format', '_get_thumbnail_filename', '_create_thumbnail',
+        '_create_alternative_resolutions', 'default_options', 'extra_options',
+    ),
+    'kvstore': ('_get', '_set_raw'),
+}
+
+
+def _full_options(backend, source, options):
+    # Те же умолчания, что подставляет ThumbnailBackend.get_thumbnail:
+    # от них зависит имя файла миниатюры.
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def render(name):
+    """Создает файлы миниатюр одной картинки, не трогая базу данных.
+
+    Запускается в дочерних процессах. Возвращает исходник и миниатюры
+    с размерами или None, если картинку не удалось прочитать.
+    """
+    backend = default.backend
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    source_image = None
+    thumbnails = []
+    try:
+        for geometry, options in geometries():
+            options = _full_options(backend, source, options)
+            thumbnail = ImageFile(
+                backend._get_thumbnail_filename(source, geometry, options),
+                default.storage
+            )
+            if thumbnail.exists():
+                thumbnail.set_size()
+            else:
+                if source_image is None:
+                    source_image = default.engine.get_image(source)
+                    source.set_size(
+                        default.engine.get_image_size(source_image)
+                    )
+                options['image_info'] = default.engine.get_image_info(
+                    source_image
+                )
+                backend._create_thumbnail(
+                    source_image, geometry, options, thumbnail
+                )
+                backend._create_alternative_resolutions(
+                    source_image, geometry, options, thumbnail.name
+                )
+            thumbnails.append(_measure(thumbnail))
+        source.set_size()
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        return None
+    finally:
+        if source_image is not None:
+            default.engine.cleanup(source_image)
+    return source, thumbnails
+
+
+def _store_many(items):
+    kvstore = default.kvstore
+    if hasattr(kvstore, 'set_many'):
+        kvstore.set_many(items)
+        return
+    for key, value in items.items():
+        kvstore._set_raw(key, value)
+
+
+def store(rendered):
+    """Записывает результаты render в хранилище ключей sorl пачкой."""
+    items = {}
+    for source, thumbnails in rendered:
+        items[add_prefix(source.key)] = serialize_image_file(source)
+        known = default.kvstore._get(source.key, identity='thumbnails') or []
+        for thumbnail in thumbnails:
+            items[add_prefix(thumbnail.key)] = serialize_image_file(thumbnail)
+        keys = set(known) | {thumbnail.key for thumbnail in thumbnails}
+        items[add_prefix(source.key, 'thumbnails')] = serialize(sorted(keys))
+    if items:
+        _store_many(items)
+    record_variants(rendered)
@@ -0,0 +1,188 @@
+from django.db import transaction
+from django.db.models import Q
+
+from yatube.settings import (
+    FEED_MAX_OFFSET, FEED_PULL_THRESHOLD, TIMELINE_BATCH_SIZE
+)
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=TIMELINE_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def followers_count(author_id):
+    counts = UserCounters.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    )
+    return next(iter(counts), 0)
+
+
+def is_pulled(author_id):
+    """Посты авторов с большим числом подписчиков не раздаются по лентам,
+    а подмешиваются в ленту при чтении."""
+    return followers_count(author_id) >= FEED_PULL_THRESHOLD
+
+
+def pulled_authors(user):
+    return list(
+        Follow.objects.filter(
+            Q(author__counters__followers_count__gte=FEED_PULL_THRESHOLD)
+            | Q(author__counters__timeline_pending=True)
+            | Q(timeline_pending=True),
+            user=user
+        ).values_list('author_id', flat=True).order_by('author_id')
+    )
+
+
+def fan_out(post):
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).order_by('pk')
+    batch = []
+    for user_id in followers.iterator(chunk_size=TIMELINE_BATCH_SIZE):
+        batch.append(TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date
+        ))
+        if len(batch) >= TIMELINE_BATCH_SIZE:
+            _bulk_insert(batch)
+            batch = []
+    _bulk_insert(batch)
+
+
+def push_post(post):
+    if not is_pulled(post.author_id):
+        fan_out(post)
+        return
+    # Пост не разложен по лентам: если автор опустится ниже порога,
+    # его разложит backfill_pending.
+    UserCounters.objects.filter(
+        user_id=post.author_id, timeline_pending=False
+    ).update(timeline_pending=True)
+
+
+def sync_post(post):
+    TimelineEntry.objects.filter(post_id=post.pk).update(
+        author_id=post.author_id,
+        pub_date=post.pub_date
+    )
+
+
+def _push_rows(user_id, author_id, rows):
+    _bulk_insert([
+        TimelineEntry(
+            user_id=user_id,
+            post_id=pk,
+            author_id=author_id,
+            pub_date=pub_date
+        )
+        for pk, pub_date in rows
+    ])
+
+
+def backfill(user_id, author_id, batch_size=TIMELINE_BATCH_SIZE):
+    posts = Post.objects.filter(author_id=author_id).order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(
+            posts.filter(pk__gt=last_pk).values_list('pk', 'pub_date')
+            [:batch_size]
+        )
+        if not chunk:
+            return
+        _push_rows(user_id, author_id, chunk)
+        last_pk = chunk[-1][0]
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def follow(user_id, author_id):
+    if is_pulled(author_id):
+        return
+    rows = list(
+        Post.objects.filter(author_id=author_id).order_by(
+            'pk'
+        ).values_list('pk', 'pub_date')[:FEED_MAX_OFFSET + 1]
+    )
+    if len(rows) > FEED_MAX_OFFSET:
+        # Постов больше, чем видно на страницах с номерами: в запросе
+        # подписки их не раскладываем, это сделает backfill_follows.
+        Follow.objects.filter(user_id=user_id, author_id=author_id).update(
+            timeline_pending=True
+        )
+        return
+    _push_rows(user_id, author_id, rows)
+
+
+def unfollow(user_id, author_id):
+    # Если автор опустился ниже порога, его посты, не разданные при
+    # публикации, отмечены timeline_pending: их разложит
+    # rebuild_timelines --pending, а до тех пор они подмешиваются при
+    # чтении.
+    prune(user_id, author_id)
+
+
+def backfill_pending(batch_size=TIMELINE_BATCH_SIZE):
+    """Раскладывает по лентам подписчиков неразданные посты авторов ниже
+    порога. Возвращает число таких авторов."""
+    authors = UserCounters.objects.filter(
+        timeline_pending=True, followers_count__lt=FEED_PULL_THRESHOLD
+    ).values_list('user_id', flat=True)
+    done = 0
+    for author_id in list(authors):
+        followers = Follow.objects.filter(author_id=author_id).order_by(
+            'user_id'
+        ).values_list('user_id', flat=True)
+        with transaction.atomic():
+            # Отметка снимается до раздачи: пост, опубликованный тем
+            # временем, поставит ее снова.
+            cleared = UserCounters.objects.filter(
+                user_id=author_id, followers_count__lt=FEED_PULL_THRESHOLD
+            ).update(timeline_pending=False)
+            if not cleared:
+                continue
+            for follower_id in followers.iterator(chunk_size=batch_size):
+                backfill(follower_id, author_id, batch_size)
+        done += 1
+    return done
+
+
+def backfill_follows(batch_size=TIMELINE_BATCH_SIZE):
+    """Раскладывает посты авторов в ленты подписчиков, подписка которых
+    отложена в follow. Возвращает число таких подписок."""
+    follows = Follow.objects.filter(timeline_pending=True).values_list(
+        'pk', 'user_id', 'author_id'
+    ).order_by('pk')
+    done = 0
+    for pk, user_id, author_id in list(follows):
+        with transaction.atomic():
+            cleared = Follow.objects.filter(
+                pk=pk, timeline_pending=True
+            ).update(timeline_pending=False)
+            if not cleared:
+                continue
+            backfill(user_id, author_id, batch_size)
+        done += 1
+    return done
+
+
+def rebuild_user(user_id, batch_size=TIMELINE_BATCH_SIZE):
+    authors = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True
+    )
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        for author_id in list(authors):
+            if not is_pulled(author_id):
+                backfill(user_id, author_id, batch_size)
+                Follow.objects.filter(
+                    user_id=user_id, author_id=author_id
+                ).update(timeline_pending=False)
@@ -0,0 +1,134 @@
+import tempfile
+import threading
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+from yatube.settings import (
+    POST_IMAGE_DECODE_SLOTS, POST_IMAGE_MAX_BYTES, POST_IMAGE_MAX_PIXELS,
+    POST_IMAGE_MAX_SIDE
+)
+
+# Параметры пересохранения для каждого разрешенного формата.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'GIF': {},
+    'WEBP': {'quality': 90},
+}
+# JPEG не умеет хранить прозрачность и палитру.
+JPEG_MODES = ('RGB', 'L', 'CMYK')
+
+# Одновременно декодируемых картинок в процессе: память воркера
+# ограничена POST_IMAGE_DECODE_SLOTS * POST_IMAGE_MAX_PIXELS.
+decode_slots = threading.BoundedSemaphore(POST_IMAGE_DECODE_SLOTS)
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше
+    POST_IMAGE_MAX_BYTES: остаток только считается, чтобы форма
+    знала настоящий размер и могла отказать."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        room = POST_IMAGE_MAX_BYTES - self.file.tell()
+        if room > 0:
+            self.file.write(raw_data[:room])
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = self.received
+        return self.file
+
+
+def bounded_uploads(view):
+    """Загрузки в view идут через BoundedUploadHandler, остальные формы
+    сайта - через обработчики по умолчанию.
+
+    Обработчик подставляется до первого чтения request.FILES, а его
+    читает и проверка CSRF в middleware: она переносится внутрь view.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers.insert(0, BoundedUploadHandler(request))
+        return protected(request, *args, **kwargs)
+    return wrapper
+
+
+def too_large(upload):
+    return upload.size > POST_IMAGE_MAX_BYTES
+
+
+def check_size(upload):
+    if too_large(upload):
+        raise ValidationError(
+            'Файл больше %(limit)d МБ',
+            code='too_large',
+            params={'limit': POST_IMAGE_MAX_BYTES // 2 ** 20}
+        )
+
+
+def _check_header(image):
+    if image.format not in SAVE_OPTIONS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается',
+            code='format',
+            params={'format': image.format}
+        )
+    width, height = image.size
+    if width * height > POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)d мегапикселей',
+            code='too_many_pixels',
+            params={'limit': POST_IMAGE_MAX_PIXELS // 10 ** 6}
+        )
+
+
+def _bounded_size(width, height):
+    scale = min(1, POST_IMAGE_MAX_SIDE / max(width, height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def sanitize(upload):
+    """Проверяет загруженную картинку и пересохраняет ее без EXIF.
+
+    Формат и пиксели сверяются по заголовку до декодирования; JPEG
+    сразу декодируется в уменьшенном масштабе. Возвращает новый файл
+    с тем же именем или бросает ValidationError.
+    """
+    check_size(upload)
+    upload.seek(0)
+    output = tempfile.TemporaryFile()
+    with decode_slots:
+        with Image.open(upload) as source:
+            _check_header(source)
+            image_format = source.format
+            if image_format == 'JPEG':
+                source.draft(source.mode, _bounded_size(*source.size))
+            # Поворот по EXIF-ориентации; копия декодируется целиком.
+            image = ImageOps.exif_transpose(source)
+        image.thumbnail((POST_IMAGE_MAX_SIDE, POST_IMAGE_MAX_SIDE))
+        # PNG пишет EXIF и текстовые блоки из info: оставляем только
+        # прозрачность.
+        image.info = {
+            key: value for key, value in image.info.items()
+            if key == 'transparency'
+        }
+        if image_format == 'JPEG' and image.mode not in JPEG_MODES:
+            image = image.convert('RGB')
+        image.save(output, image_format, **SAVE_OPTIONS[image_format])
+        image.close()
+    output.seek(0)
+    upload.seek(0)
+    return File(output, name=upload.name)
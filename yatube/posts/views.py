@@ -1,33 +1,64 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.shortcuts import redirect
 
-from yatube.settings import POSTS_ON_PAGE
+from yatube.settings import COMMENTS_ON_PAGE, POSTS_ON_PAGE, POSTS_PAGINATION
 
+from .cache import feed_cache_context, feed_version, follow_version
+from .conditional import (
+    conditional, feed_state, post_detail_state, profile_state
+)
+from .counters import counters_for
 from .models import Follow, Group, Post, User
+from .feeds import HybridFeed
 from .forms import CommentForm, PostForm
-
-
-def pagination(request, list):
-    paginator = Paginator(list, POSTS_ON_PAGE)
+from .paginators import CursorPaginator, FeedPaginator
+from .search import search as search_posts
+from .uploads import bounded_uploads
+
+
+def pagination(request, list, count=None):
+    cursor_requested = 'after' in request.GET or 'before' in request.GET
+    if cursor_requested or POSTS_PAGINATION == 'cursor':
+        paginator = CursorPaginator(list, POSTS_ON_PAGE)
+        return paginator.get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before')
+        )
+    paginator = FeedPaginator(list, POSTS_ON_PAGE)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
+def comments_pagination(request, post):
+    order = 'old' if request.GET.get('order') == 'old' else 'new'
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_ON_PAGE,
+        descending=order == 'new'
+    )
+    return paginator.get_page(after=request.GET.get('after')), order
+
+
+@conditional(feed_state)
 def index(request):
     template = 'posts/index.html'
-    posts_list = Post.objects.all()
+    posts_list = Post.objects.for_feed()
     page_obj = pagination(request, posts_list)
     context = {
         'page_obj': page_obj,
+        **feed_cache_context(request, feed_version()),
     }
     return render(request, template, context)
 
 
+@conditional(feed_state)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts_list = group.posts.all()
+    posts_list = group.posts.for_feed()
     page_obj = pagination(request, posts_list)
     template = 'posts/group_list.html'
     context = {
@@ -37,17 +68,22 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@conditional(profile_state)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(author=author)
-    posts = author.posts.all()
-    count_posts = posts.count()
-    page_obj = pagination(request, posts)
-    following = follow.exists() and request.user.is_authenticated
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    counters = counters_for(author)
+    posts = author.posts.for_feed()
+    page_obj = pagination(request, posts, count=counters.posts_count)
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
     context = {
         'posts': posts,
-        'count': count_posts,
+        'count': counters.posts_count,
+        'counters': counters,
         'page_obj': page_obj,
         'author': author,
         'following': following
@@ -55,23 +91,39 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@conditional(post_detail_state)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    count_posts = post.author.posts.all().count()
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__counters'),
+        pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments, order = comments_pagination(request, post)
     context = {
         'post': post,
-        'count': count_posts,
+        'count': counters_for(post.author).posts_count,
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'order': order,
+    }
+    return render(request, template, context)
+
 
+def post_comments(request, post_id):
+    template = 'posts/includes/comment_list.html'
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments, order = comments_pagination(request, post)
+    context = {
+        'post': post,
+        'comments': comments,
+        'order': order,
     }
     return render(request, template, context)
 
 
 @login_required
+@bounded_uploads
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -87,6 +139,7 @@ def post_create(request):
 
 
 @login_required
+@bounded_uploads
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
     current_post = get_object_or_404(Post, pk=post_id)
@@ -121,11 +174,12 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = "posts/follow.html"
-    user = get_object_or_404(User, username=request.user)
-    posts = Post.objects.filter(author__following__user=user).all()
-    page_obj = pagination(request, posts)
+    page_obj = pagination(request, HybridFeed(request.user))
     context = {
         'page_obj': page_obj,
+        **feed_cache_context(
+            request, feed_version(), follow_version(request.user.pk)
+        ),
     }
     return render(request, template, context)
 
@@ -142,8 +196,36 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    query = Follow.objects.filter(user=request.user, author=author)
-    follow = query.exists()
-    if follow:
-        query.delete()
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:follow_index')
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '')
+    context = {
+        'query': query,
+        'page_obj': search_posts(
+            query, request.GET.get('after'), POSTS_ON_PAGE
+        ),
+    }
+    return render(request, template, context)
+
+
+def search_api(request):
+    page_obj = search_posts(
+        request.GET.get('q', ''), request.GET.get('after'), POSTS_ON_PAGE
+    )
+    results = [
+        {
+            'type': hit.search_kind,
+            'id': hit.pk,
+            'post_id': getattr(hit, 'post_id', hit.pk),
+            'text': hit.text,
+            'author': hit.author.username,
+            'pub_date': hit.pub_date.isoformat(),
+            'rank': hit.search_rank,
+        }
+        for hit in page_obj
+    ]
+    return JsonResponse({'results': results, 'next': page_obj.next_cursor})
@@ -44,11 +44,52 @@ INSTALLED_APPS = [
     'sorl.thumbnail'
 ]
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Файл общего для всех процессов хоста кэша (core.cache.SQLiteCache).
+# Пустая строка - LocMemCache: у каждого процесса свой кэш, и сброс
+# версий лент не доходит до соседних воркеров.
+SHARED_CACHE_LOCATION = os.environ.get('YATUBE_SHARED_CACHE', '')
+SHARED_CACHE_MAX_ENTRIES = 20000
+
+# Метаданные миниатюр sorl отдельно: сброс кэша страниц их не трогает
+if SHARED_CACHE_LOCATION:
+    CACHES = {
+        alias: {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': SHARED_CACHE_LOCATION,
+            'OPTIONS': {
+                'TABLE': f'cache_{alias}',
+                'MAX_ENTRIES': SHARED_CACHE_MAX_ENTRIES,
+            },
+        }
+        for alias in ('default', 'thumbnails')
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'thumbnails': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'thumbnails',
+        },
     }
-}
+
+# {% cache %} и кэш страниц хранят значения в default через обертку:
+# пересчет истекшего значения один на ключ, остальные ждут его или
+# получают устаревшее значение
+STAMPEDE_STALE_TIMEOUT = 60
+STAMPEDE_LOCK_TIMEOUT = 10
+CACHES.update({
+    alias: {
+        'BACKEND': 'core.cache.StampedeCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'STALE_TIMEOUT': STAMPEDE_STALE_TIMEOUT,
+            'LOCK_TIMEOUT': STAMPEDE_LOCK_TIMEOUT,
+        },
+    }
+    for alias in ('template_fragments', 'pages')
+})
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -57,6 +98,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'posts.middleware.PageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -75,12 +117,15 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.cache.cache_timeouts',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Прогревать воркер при загрузке приложения (core.warmup)
+WARMUP = os.environ.get('YATUBE_WARMUP') == '1'
 
 
 # Database
@@ -89,9 +134,14 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get(
+            'YATUBE_DATABASE', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
     }
 }
+# PRAGMA для каждого нового соединения с SQLite, имя -> значение
+# (core.db.tune_sqlite). Задаются в yatube.settings_production
+SQLITE_PRAGMAS = {}
 
 
 # Password validation
@@ -141,8 +191,61 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+# 'offset' - номера страниц (?page=N), 'cursor' - ?after=/?before= без COUNT
+POSTS_PAGINATION = 'offset'
+# Сколько строк ленты подписок вставлять за один INSERT
+TIMELINE_BATCH_SIZE = 500
+# Пачка по умолчанию для команд обслуживания (recount, collect_media,
+# pregenerate_thumbnails, backfill_image_metadata)
+MAINTENANCE_BATCH_SIZE = 500
+# Посты авторов с таким числом подписчиков не раздаются по лентам при
+# публикации, а подмешиваются в ленту подписок при чтении
+FEED_PULL_THRESHOLD = 1000
+# Страницы ленты подписок с номерами не дальше этого поста: страница N
+# читает из каждого потока ленты N страниц строк. Глубже - ?after=
+FEED_MAX_OFFSET = POSTS_ON_PAGE * 20
+# Кэш лент сбрасывается сигналами моделей, время жизни - страховка.
+# В кэше своего процесса сброс от соседнего воркера не виден, и время
+# жизни остается прежним коротким
+FEED_CACHE_TIMEOUT = 60 * 15 if SHARED_CACHE_LOCATION else 20
+# Фрагмент одного поста в ленте. Ключ меняется вместе с updated_at поста,
+# поэтому время жизни большое
+POST_ROW_CACHE_TIMEOUT = 60 * 60 * 24
+# Страницы этих приложений целиком кэшируются по версии, которую сбрасывают
+# сигналы моделей. Личные фрагменты ({% hole %}) дорисовываются на запрос
+PAGE_CACHE_NAMESPACES = ['posts', 'about']
+PAGE_CACHE_TIMEOUT = 60 * 15 if SHARED_CACHE_LOCATION else 20
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ширины картинок постов для srcset, высота - в пропорции 960x339.
+# Миниатюры всех ширин и форматов создаются сразу при сохранении поста;
+# WEBP пропускается, если Pillow собран без него.
+POST_IMAGE_WIDTHS = [320, 640, 960]
+POST_IMAGE_FORMATS = ['WEBP', 'JPEG']
+THUMBNAIL_GEOMETRIES = [
+    (
+        f'{width}x{width * 339 // 960}',
+        {'crop': 'center', 'upscale': True, 'format': image_format}
+    )
+    for image_format in POST_IMAGE_FORMATS
+    for width in POST_IMAGE_WIDTHS
+]
+# Загрузки картинок постов пишутся во временный файл (posts.uploads.
+# bounded_uploads) и проверяются по заголовку до декодирования;
+# сохраняется пересжатая копия без EXIF
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+# Длинная сторона сохраненной картинки
+POST_IMAGE_MAX_SIDE = 2560
+# Сколько картинок процесс декодирует одновременно
+POST_IMAGE_DECODE_SLOTS = 2
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_CACHE = 'thumbnails'
+# Сколько ключей sorl держать в памяти процесса и как долго, секунд
+THUMBNAIL_LOCAL_SIZE = 10000
+THUMBNAIL_LOCAL_TIMEOUT = 60
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -0,0 +1,85 @@
+"""
+Настройки боевого сервера поверх yatube.settings:
+DJANGO_SETTINGS_MODULE=yatube.settings_production.
+
+Значения берутся из переменных окружения:
+    YATUBE_SECRET_KEY     - секретный ключ, обязателен;
+    YATUBE_ALLOWED_HOSTS  - домены через запятую;
+    YATUBE_CONN_MAX_AGE   - сколько секунд держать соединение с базой;
+    YATUBE_SHARED_CACHE   - файл общего кэша воркеров, по умолчанию
+                            var/cache.sqlite3 в каталоге проекта;
+    YATUBE_SQLITE_MMAP_SIZE, YATUBE_SQLITE_CACHE_SIZE - память SQLite
+                            в байтах и КиБ.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+# Без общего кэша сброс версий страниц не доходит до соседних воркеров.
+# Кэш хранит значения через pickle: файл по умолчанию лежит в каталоге
+# проекта, закрытом от других пользователей, а не в общем /tmp.
+if not os.environ.get('YATUBE_SHARED_CACHE'):
+    PRIVATE_DIR = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'var'
+    )
+    os.makedirs(PRIVATE_DIR, mode=0o700, exist_ok=True)
+    os.chmod(PRIVATE_DIR, 0o700)
+    os.environ['YATUBE_SHARED_CACHE'] = os.path.join(
+        PRIVATE_DIR, 'cache.sqlite3'
+    )
+
+from .settings import *  # noqa: E402,F401,F403
+from .settings import DATABASES, TEMPLATES  # noqa: E402
+
+try:
+    SECRET_KEY = os.environ['YATUBE_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Не задана переменная YATUBE_SECRET_KEY')
+
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('YATUBE_ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+]
+
+# Соединение с базой живет между запросами, а не открывается на каждый.
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 600)),
+    },
+}
+
+# Шаблоны читаются и разбираются один раз на процесс.
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+        },
+    },
+    *TEMPLATES[1:],
+]
+
+# Применяются к каждому новому соединению (core.db.tune_sqlite).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': int(
+        os.environ.get('YATUBE_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+    ),
+    # Отрицательное значение - размер в КиБ, а не в страницах.
+    'cache_size': -int(os.environ.get('YATUBE_SQLITE_CACHE_SIZE', 64000)),
+    'busy_timeout': 5000,
+}
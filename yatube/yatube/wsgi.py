@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# YATUBE_WARMUP=1: urlconf, шаблоны, sorl и переводы готовятся при
+# загрузке воркера, а не на первом запросе (core.warmup).
+warmup_timings = {}
+if settings.WARMUP:
+    from core.warmup import warm_up
+    warmup_timings = warm_up()